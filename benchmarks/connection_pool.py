@@ -0,0 +1,80 @@
+"""
+Compares the default connection pool with ``ThreadAffineConnectionPool``.
+
+Usage::
+
+    python benchmarks/connection_pool.py [--location 127.0.0.1:6379] [--db 15] [--number N]
+
+Needs a running Redis server.  Every thread issues ``--number`` ``get``
+commands; the keys of the selected database are flushed.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings
+
+settings.configure()
+
+from redis_cache import RedisCache
+from redis_cache.connection import pool
+
+
+POOL_CLASSES = [
+    'redis.ConnectionPool',
+    'redis_cache.connection.ThreadAffineConnectionPool',
+]
+
+THREADS = [1, 8, 32, 128]
+
+
+def run(cache, threads, number):
+    barrier = threading.Barrier(threads + 1)
+
+    def worker():
+        barrier.wait()
+        for _ in range(number):
+            cache.get('key')
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return threads * number / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--location', default='127.0.0.1:6379')
+    parser.add_argument('--db', type=int, default=15)
+    parser.add_argument('--number', type=int, default=2000)
+    args = parser.parse_args()
+
+    results = {}
+    for pool_class in POOL_CLASSES:
+        pool.reset()
+        cache = RedisCache(args.location, {
+            'OPTIONS': {'DB': args.db, 'CONNECTION_POOL_CLASS': pool_class},
+        })
+        cache.clear()
+        cache.set('key', 'value')
+        for threads in THREADS:
+            results[pool_class, threads] = run(cache, threads, args.number)
+        cache.clear()
+
+    default, affine = POOL_CLASSES
+    print('%8s %16s %16s %8s' % ('threads', 'default (ops/s)', 'affine (ops/s)', 'speedup'))
+    for threads in THREADS:
+        old, new = results[default, threads], results[affine, threads]
+        print('%8d %16.0f %16.0f %7.2fx' % (threads, old, new, new / old))
+
+
+if __name__ == '__main__':
+    main()
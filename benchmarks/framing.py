@@ -0,0 +1,63 @@
+"""
+Compares the framed ``get_value`` dispatch with the unframed one it replaced.
+
+Usage::
+
+    python benchmarks/framing.py [--number N]
+
+No Redis server is needed; values are encoded and decoded in process.
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings
+
+settings.configure()
+
+from redis_cache import RedisCache
+
+
+VALUES = {
+    'int': 12345,
+    'short string': 'a short string',
+    'dict': {'id': 1, 'name': 'name', 'tags': ['a', 'b', 'c']},
+    'large list': list(range(1000)),
+}
+
+
+def unframed_get_value(cache, original):
+    try:
+        value = int(original)
+    except (ValueError, TypeError):
+        value = cache.decompress(original)
+        value = cache.deserialize(value)
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--number', type=int, default=100000)
+    args = parser.parse_args()
+
+    cache = RedisCache('127.0.0.1:6379', {})
+    print('%-14s %14s %14s %8s' % ('value', 'unframed (us)', 'framed (us)', 'speedup'))
+    for name, value in VALUES.items():
+        framed = cache.prep_value(value)
+        if isinstance(framed, int):
+            framed = str(framed).encode()
+        unframed = framed
+        if framed[:2] == cache.frame_header:
+            unframed = framed[2:]
+        old = timeit.timeit(lambda: unframed_get_value(cache, unframed), number=args.number)
+        new = timeit.timeit(lambda: cache.get_value(framed), number=args.number)
+        print('%-14s %14.3f %14.3f %7.2fx' % (
+            name, old / args.number * 1e6, new / args.number * 1e6, old / new,
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,15 @@
-from functools import wraps
+from collections import defaultdict
+from functools import partial, wraps
+from itertools import chain
+import logging
+import os
+import pickle
 
 from django.core.cache.backends.base import (
     BaseCache, DEFAULT_TIMEOUT, InvalidCacheBackendError,
 )
 from django.core.exceptions import ImproperlyConfigured
+from django.utils.encoding import force_bytes, force_str
 
 try:
     import redis
@@ -13,9 +19,113 @@ except ImportError:
     )
 
 from redis.connection import DefaultParser
-from redis_cache.constants import KEY_EXPIRED, KEY_NON_VOLATILE
+from redis_cache.codec import CodecPool
+from redis_cache.compressors import COMPRESSORS, DecompressionError
+from redis_cache.constants import (
+    KEY_EXPIRED, KEY_NON_VOLATILE, FRAME_MARKER, FRAME_HEADER_SIZE,
+    FRAME_SERIALIZER_MASK, FRAME_COMPRESSOR_MASK, FRAME_COMPRESSOR_SHIFT,
+    FRAME_RAW_HEADER, INTEGER_MARKERS, CHUNK_MANIFEST_FIELD, MISSING,
+)
 from redis_cache.connection import pool
-from redis_cache.utils import get_servers, parse_connection_kwargs, import_class
+from redis_cache.pipeline import CachePipeline
+from redis_cache.serializers import SERIALIZERS, SerializationError
+from redis_cache.utils import (
+    get_servers, parse_connection_kwargs, import_class, chunks,
+    RateLimiter, is_wrong_type,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Errors raised by decoding a value that was not written by the cache.
+DECODE_ERRORS = (ValueError, TypeError, EOFError, pickle.UnpicklingError)
+
+# Serializers taking the PICKLE_VERSION option.
+PICKLE_SERIALIZERS = (
+    'redis_cache.serializers.PickleSerializer',
+    'redis_cache.serializers.ModelSerializer',
+)
+
+
+# Rewrites a value in a new format, keeping its expiry, unless the value was
+# changed since it was read.
+REWRITE_SCRIPT = """
+if redis.call('get', KEYS[1]) ~= ARGV[1] then
+    return false
+end
+local ttl = redis.call('pttl', KEYS[1])
+if ttl > 0 then
+    return redis.call('set', KEYS[1], ARGV[2], 'px', ttl)
+end
+return redis.call('set', KEYS[1], ARGV[2])
+"""
+
+# Writes one chunk of a chunked value to the hash at a key, replacing a key
+# of another type.  ARGV holds whether the key may not exist yet, the
+# timeout, the delete command, the field and the chunk.  The timeout is set on
+# new hashes, so that the chunks of an interrupted write expire.
+CHUNK_SET_SCRIPT = """
+local kind = redis.call('type', KEYS[1]).ok
+if kind == 'hash' then
+    if ARGV[1] == '1' and redis.call('hexists', KEYS[1], '%(manifest)s') == 1 then
+        return false
+    end
+    return redis.call('hset', KEYS[1], ARGV[4], ARGV[5])
+end
+if kind ~= 'none' then
+    if ARGV[1] == '1' then
+        return false
+    end
+    redis.call(ARGV[3], KEYS[1])
+end
+redis.call('hset', KEYS[1], ARGV[4], ARGV[5])
+if ARGV[2] ~= '' then
+    redis.call('expire', KEYS[1], ARGV[2])
+end
+return 1
+""" % {'manifest': CHUNK_MANIFEST_FIELD}
+
+# Points the manifest of a chunked value's hash to the chunks written for a
+# new value, then deletes the chunks of the previous value and sets the
+# expiry.  The new chunks are deleted instead if any of them is missing, or
+# if the key may not exist yet and already holds a value.  ARGV holds whether
+# the key may not exist yet, the timeout, the manifest, the token and the
+# number of chunks of the new value.
+CHUNK_MANIFEST_SCRIPT = """
+if redis.call('type', KEYS[1]).ok ~= 'hash' then
+    return false
+end
+local count = tonumber(ARGV[5])
+local previous = redis.call('hget', KEYS[1], '%(manifest)s')
+local complete = true
+for i = 0, count - 1 do
+    if redis.call('hexists', KEYS[1], ARGV[4] .. ':' .. i) == 0 then
+        complete = false
+        break
+    end
+end
+if not complete or (previous and ARGV[1] == '1') then
+    for i = 0, count - 1 do
+        redis.call('hdel', KEYS[1], ARGV[4] .. ':' .. i)
+    end
+    return false
+end
+redis.call('hset', KEYS[1], '%(manifest)s', ARGV[3])
+if previous then
+    local token, previous_count = string.match(previous, '^([^:]+):(%%d+):')
+    if token ~= ARGV[4] then
+        for i = 0, tonumber(previous_count) - 1 do
+            redis.call('hdel', KEYS[1], token .. ':' .. i)
+        end
+    end
+end
+if ARGV[2] ~= '' then
+    redis.call('expire', KEYS[1], ARGV[2])
+else
+    redis.call('persist', KEYS[1])
+end
+return 1
+""" % {'manifest': CHUNK_MANIFEST_FIELD}
 
 
 def get_client(write=False):
@@ -54,10 +164,26 @@ class BaseRedisCache(BaseCache):
         self.pickle_version = self.get_pickle_version()
         self.socket_timeout = self.get_socket_timeout()
         self.socket_connect_timeout = self.get_socket_connect_timeout()
+        self.max_connections = self.get_max_connections()
+        self.pool_timeout = self.get_pool_timeout()
+        self.warm_connections = self.get_warm_connections()
+        self.register_at_fork = self.get_register_at_fork()
+        self.max_idle_time = self.get_max_idle_time()
+        self.max_connection_age = self.get_max_connection_age()
+        self.health_check_interval = self.get_health_check_interval()
+        self.socket_keepalive = self.get_socket_keepalive()
+        self.socket_keepalive_options = self.get_socket_keepalive_options()
+        if self.register_at_fork:
+            pool.register_at_fork()
         self.connection_pool_class = self.get_connection_pool_class()
         self.connection_pool_class_kwargs = (
             self.get_connection_pool_class_kwargs()
         )
+        self.reverse_key_func = self.get_reverse_key_func()
+        self.lazy_free = self.get_lazy_free()
+        self.max_batch_size = self.get_max_batch_size()
+        self.concurrent_batches = self.get_concurrent_batches()
+        self.chunk_size = self.get_chunk_size()
 
         # Serializer
         self.serializer_class = self.get_serializer_class()
@@ -72,6 +198,23 @@ class BaseRedisCache(BaseCache):
         self.compressor = self.compressor_class(
             **self.compressor_class_kwargs
         )
+        if hasattr(self.compressor, 'bind'):
+            self.compressor.bind(self)
+
+        self.min_compress_size = self.get_min_compress_size()
+        self.min_compress_savings = self.get_min_compress_savings()
+        self.serializer_chain = self.get_serializer_chain()
+        self.frame_headers = self.get_frame_headers()
+        self.frame_header = self.get_frame_header()
+        self.uncompressed_frame_header = self.get_frame_header(compressed=False)
+        self.serializers = self.get_serializers()
+        self.compressors = self.get_compressors()
+        self.legacy_serializer = self.get_legacy_serializer()
+        self.legacy_compressor = self.get_legacy_compressor()
+        self.rewrite_on_read = self.get_rewrite_on_read()
+        self.codec_pool_size = self.get_codec_pool_size()
+        self.codec_pool_min_items = self.get_codec_pool_min_items()
+        self.codec_pool = self.get_codec_pool()
 
         redis_py_version = tuple(int(part) for part in redis.__version__.split('.'))
         if redis_py_version < (3, 0, 0):
@@ -119,15 +262,129 @@ class BaseRedisCache(BaseCache):
     def get_socket_connect_timeout(self):
         return self.options.get('SOCKET_CONNECT_TIMEOUT', None)
 
+    def get_max_connections(self):
+        _max_connections = self.options.get('MAX_CONNECTIONS', None)
+        if _max_connections is None:
+            return None
+        try:
+            max_connections = int(_max_connections)
+        except (ValueError, TypeError):
+            raise ImproperlyConfigured("max connections must be an integer")
+        if max_connections < 1:
+            raise ImproperlyConfigured("max connections must be positive")
+        return max_connections
+
+    def get_pool_timeout(self):
+        return self.options.get('POOL_TIMEOUT', 20)
+
+    def get_warm_connections(self):
+        _warm_connections = self.options.get('WARM_CONNECTIONS', 0)
+        try:
+            warm_connections = int(_warm_connections)
+        except (ValueError, TypeError):
+            raise ImproperlyConfigured("warm connections must be an integer")
+        if warm_connections < 0:
+            raise ImproperlyConfigured("warm connections must not be negative")
+        return warm_connections
+
+    def get_register_at_fork(self):
+        return bool(self.options.get('REGISTER_AT_FORK', False))
+
+    def get_seconds_option(self, name, description):
+        _seconds = self.options.get(name, None)
+        if _seconds is None:
+            return None
+        try:
+            seconds = float(_seconds)
+        except (ValueError, TypeError):
+            raise ImproperlyConfigured("%s must be a number" % description)
+        if seconds <= 0:
+            raise ImproperlyConfigured("%s must be positive" % description)
+        return seconds
+
+    def get_max_idle_time(self):
+        return self.get_seconds_option('MAX_IDLE_TIME', "max idle time")
+
+    def get_max_connection_age(self):
+        return self.get_seconds_option('MAX_CONNECTION_AGE', "max connection age")
+
+    def get_health_check_interval(self):
+        _health_check_interval = self.options.get('HEALTH_CHECK_INTERVAL', 0)
+        try:
+            health_check_interval = int(_health_check_interval)
+        except (ValueError, TypeError):
+            raise ImproperlyConfigured("health check interval must be an integer")
+        if health_check_interval < 0:
+            raise ImproperlyConfigured("health check interval must not be negative")
+        return health_check_interval
+
+    def get_socket_keepalive(self):
+        return bool(self.options.get('SOCKET_KEEPALIVE', False))
+
+    def get_socket_keepalive_options(self):
+        return self.options.get('SOCKET_KEEPALIVE_OPTIONS', None)
+
     def get_connection_pool_class(self):
         pool_class = self.options.get(
             'CONNECTION_POOL_CLASS',
             'redis.ConnectionPool'
         )
-        return import_class(pool_class)
+        pool_class = import_class(pool_class)
+        if self.max_connections is not None:
+            # Bounded pools wait for a connection rather than failing.
+            if pool_class is redis.ConnectionPool:
+                pool_class = redis.BlockingConnectionPool
+            elif not issubclass(pool_class, redis.BlockingConnectionPool):
+                raise ImproperlyConfigured(
+                    "MAX_CONNECTIONS requires a blocking connection pool, but %s "
+                    "does not block; set max_connections in "
+                    "CONNECTION_POOL_CLASS_KWARGS instead" % pool_class.__name__
+                )
+        return pool_class
 
     def get_connection_pool_class_kwargs(self):
-        return self.options.get('CONNECTION_POOL_CLASS_KWARGS', {})
+        kwargs = dict(self.options.get('CONNECTION_POOL_CLASS_KWARGS', {}))
+        if self.max_connections is not None:
+            kwargs['max_connections'] = self.max_connections
+            if issubclass(self.connection_pool_class, redis.BlockingConnectionPool):
+                kwargs.setdefault('timeout', self.pool_timeout)
+        return kwargs
+
+    def get_lazy_free(self):
+        return bool(self.options.get('LAZY_FREE', False))
+
+    def get_reverse_key_func(self):
+        reverse_key_func = self.options.get('REVERSE_KEY_FUNCTION', None)
+        if reverse_key_func is None or callable(reverse_key_func):
+            return reverse_key_func
+        return import_class(reverse_key_func)
+
+    def get_max_batch_size(self):
+        _max_batch_size = self.options.get('MAX_BATCH_SIZE', None)
+        if _max_batch_size is None:
+            return None
+        try:
+            max_batch_size = int(_max_batch_size)
+        except (ValueError, TypeError):
+            raise ImproperlyConfigured("max batch size must be an integer")
+        if max_batch_size < 1:
+            raise ImproperlyConfigured("max batch size must be positive")
+        return max_batch_size
+
+    def get_concurrent_batches(self):
+        return bool(self.options.get('CONCURRENT_BATCHES', False))
+
+    def get_chunk_size(self):
+        _chunk_size = self.options.get('CHUNK_SIZE', None)
+        if _chunk_size is None:
+            return None
+        try:
+            chunk_size = int(_chunk_size)
+        except (ValueError, TypeError):
+            raise ImproperlyConfigured("chunk size must be an integer")
+        if chunk_size < 1:
+            raise ImproperlyConfigured("chunk size must be positive")
+        return chunk_size
 
     def get_serializer_class(self):
         serializer_class = self.options.get(
@@ -142,11 +399,20 @@ class BaseRedisCache(BaseCache):
             'SERIALIZER_CLASS',
             'redis_cache.serializers.PickleSerializer'
         )
-        if serializer_class == 'redis_cache.serializers.PickleSerializer':
+        if serializer_class in PICKLE_SERIALIZERS:
             kwargs['pickle_version'] = kwargs.get(
                 'pickle_version',
                 self.pickle_version
             )
+        elif serializer_class in (
+            'redis_cache.serializers.NdarraySerializer',
+            'redis_cache.serializers.OrjsonSerializer',
+        ):
+            fallback = kwargs.get('fallback', 'redis_cache.serializers.PickleSerializer')
+            if fallback in PICKLE_SERIALIZERS:
+                fallback_kwargs = dict(kwargs.get('fallback_kwargs') or {})
+                fallback_kwargs.setdefault('pickle_version', self.pickle_version)
+                kwargs['fallback_kwargs'] = fallback_kwargs
         return kwargs
 
     def get_compressor_class(self):
@@ -159,6 +425,125 @@ class BaseRedisCache(BaseCache):
     def get_compressor_class_kwargs(self):
         return self.options.get('COMPRESSOR_CLASS_KWARGS', {})
 
+    def get_min_compress_size(self):
+        _min_compress_size = self.options.get('MIN_COMPRESS_SIZE', 0)
+        try:
+            min_compress_size = int(_min_compress_size)
+        except (ValueError, TypeError):
+            raise ImproperlyConfigured("min compress size must be an integer")
+        if min_compress_size < 0:
+            raise ImproperlyConfigured("min compress size must not be negative")
+        return min_compress_size
+
+    def get_min_compress_savings(self):
+        _min_compress_savings = self.options.get('MIN_COMPRESS_SAVINGS', 0)
+        try:
+            min_compress_savings = float(_min_compress_savings)
+        except (ValueError, TypeError):
+            raise ImproperlyConfigured("min compress savings must be a number")
+        if not 0 <= min_compress_savings < 1:
+            raise ImproperlyConfigured("min compress savings must be between 0 and 1")
+        return min_compress_savings
+
+    def get_serializers(self):
+        """
+        Returns the serializers used to read framed values, by frame id.
+        """
+        serializers = {
+            serializer_id: serializer_class()
+            for serializer_id, serializer_class in SERIALIZERS.items()
+        }
+        for serializer in self.serializer_chain:
+            serializer_id = getattr(serializer, 'serializer_id', None)
+            if serializer_id is not None:
+                serializers[serializer_id] = serializer
+        return serializers
+
+    def get_serializer_chain(self):
+        """
+        Returns the configured serializer followed by the serializers it
+        falls back to for values it cannot store.
+        """
+        chain = [self.serializer]
+        while getattr(chain[-1], 'fallback', None) is not None:
+            chain.append(chain[-1].fallback)
+        return chain
+
+    def get_compressors(self):
+        """
+        Returns the compressors used to read framed values, by frame id.
+        """
+        compressors = {
+            compressor_id: compressor_class()
+            for compressor_id, compressor_class in COMPRESSORS.items()
+        }
+        compressor_id = getattr(self.compressor, 'compressor_id', None)
+        if compressor_id is not None:
+            compressors[compressor_id] = self.compressor
+        return compressors
+
+    def get_legacy_serializer(self):
+        """
+        Returns the serializer used to read values written without a frame
+        header.
+        """
+        serializer_class = self.options.get('LEGACY_SERIALIZER_CLASS', None)
+        if serializer_class is None:
+            return self.serializer
+        return import_class(serializer_class)()
+
+    def get_legacy_compressor(self):
+        """
+        Returns the compressor used to read values written without a frame
+        header.
+        """
+        compressor_class = self.options.get('LEGACY_COMPRESSOR_CLASS', None)
+        if compressor_class is None:
+            return self.compressor
+        return import_class(compressor_class)()
+
+    def get_rewrite_on_read(self):
+        return bool(self.options.get('REWRITE_ON_READ', False))
+
+    def get_codec_pool_size(self):
+        _codec_pool_size = self.options.get('CODEC_POOL_SIZE', None)
+        if _codec_pool_size is None:
+            return None
+        try:
+            codec_pool_size = int(_codec_pool_size)
+        except (ValueError, TypeError):
+            raise ImproperlyConfigured("codec pool size must be an integer")
+        if codec_pool_size < 1:
+            raise ImproperlyConfigured("codec pool size must be positive")
+        return codec_pool_size
+
+    def get_codec_pool_min_items(self):
+        _codec_pool_min_items = self.options.get('CODEC_POOL_MIN_ITEMS', 64)
+        try:
+            codec_pool_min_items = int(_codec_pool_min_items)
+        except (ValueError, TypeError):
+            raise ImproperlyConfigured("codec pool min items must be an integer")
+        if codec_pool_min_items < 1:
+            raise ImproperlyConfigured("codec pool min items must be positive")
+        return codec_pool_min_items
+
+    def get_codec_pool(self):
+        """
+        Returns the pool encoding and decoding large batches of values, or
+        ``None`` if they are encoded and decoded in the calling thread.
+        """
+        kind = self.options.get('CODEC_POOL', None)
+        if kind is None:
+            return None
+        if kind not in ('thread', 'process'):
+            raise ImproperlyConfigured("codec pool must be 'thread' or 'process'")
+        return CodecPool(
+            self,
+            processes=kind == 'process',
+            workers=self.codec_pool_size,
+            min_items=self.codec_pool_min_items,
+        )
+
     def get_master_client(self):
         """
         Get the write server:port of the master cache
@@ -195,6 +580,12 @@ class BaseRedisCache(BaseCache):
             parser_class=self.parser_class,
             connection_pool_class=self.connection_pool_class,
             connection_pool_class_kwargs=self.connection_pool_class_kwargs,
+            warm_connections=self.warm_connections,
+            max_idle_time=self.max_idle_time,
+            max_connection_age=self.max_connection_age,
+            health_check_interval=self.health_check_interval,
+            socket_keepalive=self.socket_keepalive,
+            socket_keepalive_options=self.socket_keepalive_options,
         )
         connection_pool = pool.get_connection_pool(client, **kwargs)
         client.connection_pool = connection_pool
@@ -212,19 +603,272 @@ class BaseRedisCache(BaseCache):
     def decompress(self, value):
         return self.compressor.decompress(value)
 
+    def get_frame_headers(self):
+        """
+        Returns the compressed and uncompressed frame headers of every
+        serializer in the chain by serializer id, or ``None`` if a serializer
+        or the compressor has no frame id.  Raises ``ImproperlyConfigured``
+        if values are unframed and the serializer has a fallback.
+        """
+        compressor_id = getattr(self.compressor, 'compressor_id', None)
+        serializer_ids = [
+            getattr(serializer, 'serializer_id', None)
+            for serializer in self.serializer_chain
+        ]
+        if compressor_id is None or None in serializer_ids:
+            if len(serializer_ids) > 1:
+                # Unframed values do not record which serializer stored them.
+                raise ImproperlyConfigured(
+                    "serializers with a fallback require a compressor with a compressor_id"
+                )
+            return None
+        return {
+            serializer_id: (
+                FRAME_MARKER + bytes((serializer_id | compressor_id << FRAME_COMPRESSOR_SHIFT,)),
+                FRAME_MARKER + bytes((serializer_id,)),
+            )
+            for serializer_id in serializer_ids
+        }
+
+    def get_frame_header(self, compressed=True):
+        """
+        Returns the header written in front of values serialized by the
+        configured serializer, or ``None`` if values are stored unframed.
+        """
+        if self.frame_headers is None:
+            return None
+        headers = self.frame_headers[self.serializer.serializer_id]
+        return headers[0] if compressed else headers[1]
+
+    def serialize_value(self, value):
+        """
+        Returns the serializer that stores ``value`` and the serialized value.
+        Serializers hand the values they do not accept, or cannot serialize,
+        to their fallback.
+        """
+        serializer = self.serializer
+        while serializer.fallback is not None:
+            if serializer.accepts(value):
+                try:
+                    return serializer, serializer.serialize(value)
+                except SerializationError:
+                    pass
+            serializer = serializer.fallback
+        return serializer, serializer.serialize(value)
+
     def get_value(self, original):
+        marker = original[:1]
+        if marker in INTEGER_MARKERS:
+            try:
+                return int(original)
+            except ValueError:
+                # Unframed value written by an older version of the cache.
+                pass
+        elif marker == FRAME_MARKER:
+            return self.get_framed_value(original)
+        value = self.legacy_compressor.decompress(original)
+        return self.legacy_serializer.deserialize(value)
+
+    def get_framed_value(self, original):
+        serializer, value = self.unframe(original)
+        if serializer is None:
+            return bytes(value)
+        return serializer.deserialize(value)
+
+    def unframe(self, original):
+        """
+        Returns the serializer of the framed value ``original`` and its
+        decompressed payload.  The serializer is ``None`` for raw bytes.
+        """
+        descriptor = original[1]
+        serializer_id = descriptor & FRAME_SERIALIZER_MASK
+        compressor_id = (descriptor & FRAME_COMPRESSOR_MASK) >> FRAME_COMPRESSOR_SHIFT
+        value = memoryview(original)[FRAME_HEADER_SIZE:]
+        if not serializer_id:
+            return None, value
         try:
-            value = int(original)
-        except (ValueError, TypeError):
-            value = self.decompress(original)
-            value = self.deserialize(value)
-        return value
+            serializer = self.serializers[serializer_id]
+            compressor = self.compressors[compressor_id]
+        except KeyError:
+            raise ValueError(
+                "Unknown serializer id %d or compressor id %d" % (serializer_id, compressor_id)
+            )
+        if compressor_id:
+            value = compressor.decompress(value)
+        return serializer, value
+
+    def get_values(self, originals):
+        """
+        Returns the values of ``originals``, with ``MISSING`` for missing
+        values and values that cannot be decompressed.  Large batches are
+        decoded by the codec pool, if there is one.
+        """
+        if self.codec_pool is None:
+            return self.decode_values(originals)
+        return self.codec_pool.get_values(originals)
+
+    def decode_values(self, originals):
+        """
+        Returns the values of ``originals``, with ``MISSING`` for missing
+        values and values that cannot be decompressed.  Framed values are
+        deserialized together, per serializer.
+        """
+        values = [MISSING] * len(originals)
+        framed = defaultdict(list)
+        for index, original in enumerate(originals):
+            if original is None:
+                continue
+            try:
+                if original[:1] == FRAME_MARKER:
+                    serializer, value = self.unframe(original)
+                    if serializer is None:
+                        values[index] = bytes(value)
+                    else:
+                        framed[serializer].append((index, value))
+                else:
+                    values[index] = self.get_value(original)
+            except DecompressionError:
+                continue
+        for serializer, items in framed.items():
+            indexes, payloads = zip(*items)
+            for index, value in zip(indexes, serializer.deserialize_many(payloads)):
+                values[index] = value
+        return values
+
+    def is_stale(self, original):
+        """
+        Returns whether ``original`` was written with a different serializer
+        or compressor than the configured ones.  Raw bytes, which are only
+        stored in chunks, are never stale.
+        """
+        if self.frame_header is None:
+            return False
+        marker = original[:1]
+        if marker != FRAME_MARKER:
+            return marker not in INTEGER_MARKERS
+        descriptor, current = original[1], self.frame_header[1]
+        serializer_id = descriptor & FRAME_SERIALIZER_MASK
+        if not serializer_id:
+            return False
+        if serializer_id not in self.frame_headers:
+            return True
+        return descriptor & FRAME_COMPRESSOR_MASK not in (0, current & FRAME_COMPRESSOR_MASK)
+
+    def rewrite_values(self, items):
+        """
+        Rewrites ``(key, original, value)`` items in the configured format,
+        keeping their expiry.  Keys changed since they were read are skipped.
+        """
+        pipelines = {}
+        for key, original, value in items:
+            client = self.get_client(key, write=True)
+            if client not in pipelines:
+                pipelines[client] = client.pipeline(transaction=False)
+            pipelines[client].eval(REWRITE_SCRIPT, 1, key, original, self.prep_value(value))
+        for pipeline in pipelines.values():
+            pipeline.execute()
 
     def prep_value(self, value):
         if isinstance(value, int) and not isinstance(value, bool):
             return value
-        value = self.serialize(value)
-        return self.compress(value)
+        if isinstance(value, bytes) and self.is_chunked(value) and self.frame_header is not None:
+            # Large bytes values are stored as is so that they can be streamed.
+            return FRAME_RAW_HEADER + value
+        if self.frame_headers is None:
+            return self.compress(self.serialize(value))
+        if len(self.serializer_chain) == 1:
+            frame_header, uncompressed_frame_header = self.frame_header, self.uncompressed_frame_header
+            if frame_header == uncompressed_frame_header:
+                # The serializer writes the header itself, so that large
+                # values are not copied again to prepend it.
+                return self.serializer.serialize_framed(value, frame_header)
+            value = self.serialize(value)
+        else:
+            serializer, value = self.serialize_value(value)
+            frame_header, uncompressed_frame_header = self.frame_headers[serializer.serializer_id]
+        if frame_header == uncompressed_frame_header:
+            return frame_header + value
+        if len(value) < self.min_compress_size:
+            return uncompressed_frame_header + value
+        compressed = self.compress(value)
+        if len(compressed) >= len(value) * (1 - self.min_compress_savings):
+            # Compression does not save enough to be worth decompressing.
+            return uncompressed_frame_header + value
+        return frame_header + compressed
+
+    def prep_values(self, values):
+        """
+        Returns the encoded ``values``.  Large batches are encoded by the
+        codec pool, if there is one.
+        """
+        if self.codec_pool is None:
+            return self.encode_values(values)
+        return self.codec_pool.prep_values(values)
+
+    def encode_values(self, values):
+        return [self.prep_value(value) for value in values]
+
+    def is_chunked(self, value):
+        """
+        Returns whether ``value`` is too large to be stored in a single key.
+        """
+        return (
+            self.chunk_size is not None
+            and not isinstance(value, int)
+            and len(value) > self.chunk_size
+        )
+
+    def join_chunks(self, fields):
+        """
+        Returns the value held by the fields of a chunked value's hash, or
+        None if the hash holds no manifest or is missing a chunk.
+        """
+        if not isinstance(fields, dict):
+            return None
+        manifest = fields.get(force_bytes(CHUNK_MANIFEST_FIELD))
+        if manifest is None:
+            return None
+        token, count, _ = manifest.split(b':')
+        try:
+            return b''.join(
+                fields[b'%s:%d' % (token, index)] for index in range(int(count))
+            )
+        except KeyError:
+            # Values missing a chunk are misses.
+            return None
+
+    def batches(self, items):
+        return chunks(items, self.max_batch_size)
+
+    def _batch(self, client, items, command):
+        """
+        Calls ``command(client, batch)`` for every batch of at most
+        ``MAX_BATCH_SIZE`` items and returns the results.
+
+        Batches are sent one after another, unless ``CONCURRENT_BATCHES`` is
+        set, in which case they are pipelined and sent together.
+        """
+        if self.concurrent_batches and self.max_batch_size:
+            pipeline = client.pipeline(transaction=False)
+            for batch in self.batches(items):
+                command(pipeline, batch)
+            return pipeline.execute()
+        return (command(client, batch) for batch in self.batches(items))
+
+    def reverse_key(self, key, version=None):
+        """
+        Returns the cache key of the redis key ``key``, stripped of the key
+        prefix and ``version`` added by the default key function.
+        """
+        key = force_str(key)
+        if self.reverse_key_func is not None:
+            return self.reverse_key_func(key)
+        if version is None:
+            version = self.version
+        prefix = '%s:%s:' % (self.key_prefix, version)
+        if not key.startswith(prefix):
+            raise ValueError("Key '%s' does not start with '%s'" % (key, prefix))
+        return key[len(prefix):]
 
     def make_keys(self, keys, version=None):
         return [self.make_key(key, version=version) for key in keys]
@@ -252,12 +896,31 @@ class BaseRedisCache(BaseCache):
         return self._set(client, key, self.prep_value(value), timeout, _add_only=True)
 
     def _get(self, client, key, default=None):
-        value = client.get(key)
-        if value is None:
+        try:
+            original = client.get(key)
+        except redis.ResponseError as e:
+            if not is_wrong_type(e):
+                raise
+            return self._get_chunked(client, key, default)
+        if original is None:
             return default
-        value = self.get_value(value)
+        try:
+            value = self.get_value(original)
+        except DecompressionError:
+            return default
+        if self.rewrite_on_read and self.is_stale(original):
+            self.rewrite_values([(key, original, value)])
         return value
 
+    def _get_chunked(self, client, key, default=None):
+        original = self.join_chunks(client.hgetall(key))
+        if original is None:
+            return default
+        try:
+            return self.get_value(original)
+        except DecompressionError:
+            return default
+
     @get_client()
     def get(self, client, key, default=None):
         """Retrieve a value from the cache.
@@ -271,8 +934,41 @@ class BaseRedisCache(BaseCache):
             return False
         elif timeout == 0:
             return client.expire(key, 0)
+        if self.is_chunked(value):
+            return self._set_chunks(client, key, value, timeout, _add_only=_add_only)
         return client.set(key, value, nx=_add_only, ex=timeout)
 
+    def _set_chunks(self, client, key, value, timeout, _add_only=False):
+        """
+        Stores ``value`` as a hash of chunks at ``key``, so that the chunks
+        share the key's expiry and are replaced and deleted with it.
+
+        Every chunk is written by its own command, under a new token, so
+        that the server is never blocked by the whole value and readers see
+        the previous value until the manifest is replaced.  The commands are
+        queued on ``client`` if it is a pipeline; the result of the last one
+        is the result of the write.
+        """
+        pipeline = client
+        if not isinstance(client, redis.client.Pipeline):
+            pipeline = client.pipeline(transaction=False)
+        token = os.urandom(8).hex()
+        view = memoryview(value)
+        add_only = int(_add_only)
+        timeout = '' if timeout is None else timeout
+        delete = 'unlink' if self.lazy_free else 'del'
+        count = 0
+        for offset in range(0, len(view), self.chunk_size):
+            pipeline.eval(
+                CHUNK_SET_SCRIPT, 1, key, add_only, timeout, delete,
+                '%s:%d' % (token, count), view[offset:offset + self.chunk_size],
+            )
+            count += 1
+        manifest = '%s:%d:%d' % (token, count, len(view))
+        pipeline.eval(CHUNK_MANIFEST_SCRIPT, 1, key, add_only, timeout, manifest, token, count)
+        if pipeline is not client:
+            return pipeline.execute()[-1]
+
     @get_client(write=True)
     def set(self, client, key, value, timeout=DEFAULT_TIMEOUT):
         """Persist a value to the cache, and set an optional expiration time.
@@ -281,13 +977,20 @@ class BaseRedisCache(BaseCache):
         result = self._set(client, key, self.prep_value(value), timeout, _add_only=False)
         return result
 
+    def _delete(self, client, *keys):
+        if self.lazy_free:
+            return client.unlink(*keys)
+        return client.delete(*keys)
+
     @get_client(write=True)
     def delete(self, client, key):
         """Remove a key from the cache."""
-        return client.delete(key)
+        return self._delete(client, key)
 
     def _delete_many(self, client, keys):
-        return client.delete(*keys)
+        return sum(self._batch(
+            client, keys, lambda client, batch: self._delete(client, *batch)
+        ))
 
     def delete_many(self, keys, version=None):
         """
@@ -296,7 +999,7 @@ class BaseRedisCache(BaseCache):
         raise NotImplementedError
 
     def _clear(self, client):
-        return client.flushdb()
+        return client.flushdb(asynchronous=self.lazy_free)
 
     def clear(self, version=None):
         """Flush cache keys.
@@ -312,12 +1015,22 @@ class BaseRedisCache(BaseCache):
 
         # Only try to mget if we actually received any keys to get
         if map_keys:
-            results = client.mget(versioned_keys)
-
-            for key, value in zip(versioned_keys, results):
-                if value is None:
+            strings = list(chain.from_iterable(self._batch(
+                client, versioned_keys, lambda client, batch: client.mget(batch)
+            )))
+
+            results = self._get_chunked_values(client, versioned_keys, strings)
+            values = self.get_values(results)
+            stale = []
+            for key, string, original, value in zip(versioned_keys, strings, results, values):
+                if value is MISSING:
                     continue
-                recovered_data[map_keys[key]] = self.get_value(value)
+                recovered_data[map_keys[key]] = value
+                # Chunked values, read from hashes, are not rewritten.
+                if self.rewrite_on_read and string is not None and self.is_stale(original):
+                    stale.append((key, original, value))
+            if stale:
+                self.rewrite_values(stale)
 
         return recovered_data
 
@@ -325,12 +1038,126 @@ class BaseRedisCache(BaseCache):
         """Retrieve many keys."""
         raise NotImplementedError
 
-    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+    def _get_chunked_values(self, client, keys, results):
+        """
+        Fills in the MGET ``results`` of chunked values, for which MGET
+        returns None since they are stored as hashes.
+        """
+        if self.chunk_size is None:
+            return results
+        missing = [key for key, result in zip(keys, results) if result is None]
+        if not missing:
+            return results
+        pipeline = client.pipeline(transaction=False)
+        for key in missing:
+            pipeline.hgetall(key)
+        chunked = dict(zip(missing, pipeline.execute(raise_on_error=False)))
+        return [
+            self.join_chunks(chunked[key]) if result is None else result
+            for key, result in zip(keys, results)
+        ]
+
+    @get_client()
+    def get_stream(self, client, key, prefetch=2):
+        """Returns an iterator over the bytes of a bytes value, or None if the
+        key does not exist.
+
+        Chunked values are read ``prefetch`` chunks per round trip, so the
+        whole value is never held in memory.
+        """
+        try:
+            original = client.get(key)
+        except redis.ResponseError as e:
+            if not is_wrong_type(e):
+                raise
+            return self._stream_chunks(client, key, prefetch)
+        if original is None:
+            return None
+        try:
+            value = self.get_value(original)
+        except DecompressionError:
+            return None
+        if not isinstance(value, bytes):
+            raise TypeError("Key '%s' does not hold a bytes value" % key)
+        return iter((value,))
+
+    def _stream_chunks(self, client, key, prefetch):
+        manifest = client.hget(key, CHUNK_MANIFEST_FIELD)
+        if manifest is None:
+            return None
+        token, count, _ = manifest.split(b':')
+        fields = [b'%s:%d' % (token, index) for index in range(int(count))]
+        first = client.hget(key, fields[0])
+        if first is None:
+            return None
+        if first[:FRAME_HEADER_SIZE] != FRAME_RAW_HEADER:
+            raise TypeError("Key '%s' does not hold a bytes value" % key)
+        return self._iter_chunks(client, key, first, fields[1:], prefetch)
+
+    def _iter_chunks(self, client, key, first, fields, prefetch):
+        yield first[FRAME_HEADER_SIZE:]
+        for batch in chunks(fields, prefetch):
+            pipeline = client.pipeline(transaction=False)
+            for field in batch:
+                pipeline.hget(key, field)
+            for chunk in pipeline.execute():
+                if chunk is None:
+                    raise ValueError("Key '%s' changed while it was streamed" % key)
+                yield chunk
+
+    def _set_many(self, client, items):
+        """
+        Sets ``(key, value, timeout)`` items.  Keys without an expiry are
+        written with a single MSET per batch.
+        """
+        if self.codec_pool is not None:
+            # The codec pool encodes the whole set of values in parallel.
+            values = self.prep_values([value for _, value, _ in items])
+            items = [
+                (key, value, timeout)
+                for (key, _, timeout), value in zip(items, values)
+            ]
+        # Batches are not wrapped in a transaction, so that the server never
+        # blocks on more than one batch at a time.
+        pipeline = client.pipeline(transaction=False)
+        for batch in self.batches(items):
+            mapping = {}
+            for key, value, timeout in batch:
+                if self.codec_pool is None:
+                    # Values are encoded batch by batch, so that only one
+                    # batch of encoded values is held in memory at a time.
+                    value = self.prep_value(value)
+                if timeout is None and not self.is_chunked(value):
+                    mapping[key] = value
+                else:
+                    self._set(pipeline, key, value, timeout)
+            if mapping:
+                pipeline.mset(mapping)
+            if not self.concurrent_batches:
+                # Sends the batch and resets the pipeline for the next one.
+                pipeline.execute()
+        if self.concurrent_batches:
+            pipeline.execute()
+
+    def get_timeouts(self, keys, timeout, timeouts=None):
+        """
+        Returns a dict mapping each key to its timeout.  Keys missing from
+        ``timeouts`` use ``timeout``.
+        """
+        timeout = self.get_timeout(timeout)
+        timeouts = timeouts or {}
+        return {
+            key: self.get_timeout(timeouts[key]) if key in timeouts else timeout
+            for key in keys
+        }
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, timeouts=None):
         """Set a bunch of values in the cache at once from a dict of key/value
         pairs. This is much more efficient than calling set() multiple times.
 
         If timeout is given, that timeout will be used for the key; otherwise
-        the default cache timeout will be used.
+        the default cache timeout will be used.  ``timeouts`` maps keys to
+        their own timeout, overriding ``timeout``.
         """
         raise NotImplementedError
 
@@ -380,7 +1207,9 @@ class BaseRedisCache(BaseCache):
         Otherwise, the value is the number of seconds remaining.  If the key
         does not exist, 0 is returned.
         """
-        ttl = client.ttl(key)
+        return self.parse_ttl(client.ttl(key))
+
+    def parse_ttl(self, ttl):
         if ttl == KEY_NON_VOLATILE:
             return None
         elif ttl == KEY_EXPIRED:
@@ -388,12 +1217,127 @@ class BaseRedisCache(BaseCache):
         else:
             return ttl
 
-    def _delete_pattern(self, client, pattern):
-        keys = list(client.scan_iter(match=pattern))
-        if keys:
-            client.delete(*keys)
+    def _pipeline_many(self, method, keys, *args, **kwargs):
+        """
+        Calls the ``CachePipeline`` ``method`` for every key, with one round
+        trip per node, and returns a dict of the results keyed by the
+        original keys.
+        """
+        with self.pipeline() as pipeline:
+            futures = [
+                (key, getattr(pipeline, method)(key, *args, **kwargs))
+                for key in keys
+            ]
+        return {key: future.result() for key, future in futures}
+
+    def ttl_many(self, keys, version=None):
+        """Returns a dict mapping each key to its 'time-to-live', as ``ttl``
+        would return it.
+        """
+        return self._pipeline_many('ttl', keys, version=version)
 
-    def delete_pattern(self, pattern, version=None):
+    def touch_many(self, keys, timeout=DEFAULT_TIMEOUT, version=None):
+        """Reset the timeout of many keys to `timeout` seconds.
+
+        Returns a dict mapping each key to whether its timeout was updated.
+        """
+        return self._pipeline_many('touch', keys, timeout=timeout, version=version)
+
+    def persist_many(self, keys, version=None):
+        """Remove the timeout on many keys.
+
+        Returns a dict mapping each key to whether its timeout was removed.
+        """
+        return self._pipeline_many('persist', keys, version=version)
+
+    def has_keys(self, keys, version=None):
+        """Returns a dict mapping each key to whether it is in the cache."""
+        return self._pipeline_many('has_key', keys, version=version)
+
+    def pipeline(self):
+        """Returns a ``CachePipeline`` that batches cache commands.
+
+        Each command returns a ``CacheFuture`` that is resolved when the
+        pipeline is executed, which happens on exit when used as a context
+        manager::
+
+            with cache.pipeline() as p:
+                a = p.get('a')
+                p.set('b', 1)
+            a.result()
+        """
+        return CachePipeline(self)
+
+    def _scan(self, client, pattern, count=None):
+        """
+        Yields the pages of keys matching ``pattern`` as SCAN returns them.
+        """
+        cursor = 0
+        while True:
+            cursor, keys = client.scan(cursor=cursor, match=pattern, count=count)
+            if keys:
+                yield keys
+            if not cursor:
+                return
+
+    def _iter_keys(self, client, pattern, version=None, count=None):
+        for keys in self._scan(client, pattern, count=count):
+            for key in keys:
+                yield self.reverse_key(key, version=version)
+
+    def iter_keys(self, pattern, version=None, count=None):
+        """Yields the keys matching the glob-style ``pattern``.
+
+        Keys are streamed with SCAN rather than loaded all at once, and are
+        returned without their key prefix and version.
+        """
+        raise NotImplementedError
+
+    def _iter_items(self, client, pattern, version=None, count=None):
+        for keys in self._scan(client, pattern, count=count):
+            originals = self._get_chunked_values(client, keys, client.mget(keys))
+            for key, value in zip(keys, self.get_values(originals)):
+                if value is not MISSING:
+                    yield self.reverse_key(key, version=version), value
+
+    def iter_items(self, pattern, version=None, count=None):
+        """Yields ``(key, value)`` pairs for the keys matching ``pattern``.
+
+        Values are fetched with one MGET per SCAN page.
+        """
+        raise NotImplementedError
+
+    def _delete_pattern(self, client, pattern, count=None, rate_limit=None):
+        """
+        Unlinks the keys matching ``pattern`` page by page as SCAN progresses.
+
+        The UNLINK for each page is pipelined with the SCAN for the next one,
+        and redis reclaims the memory in the background.
+        """
+        throttle = RateLimiter(rate_limit)
+        deleted = 0
+        cursor, keys = 0, []
+        while True:
+            pipeline = client.pipeline(transaction=False)
+            if keys:
+                pipeline.unlink(*keys)
+            pipeline.scan(cursor=cursor, match=pattern, count=count)
+            results = pipeline.execute()
+            if keys:
+                deleted += results[0]
+                throttle(len(keys))
+            cursor, keys = results[-1]
+            if not cursor:
+                if keys:
+                    deleted += client.unlink(*keys)
+                return deleted
+
+    def delete_pattern(self, pattern, version=None, count=None, rate_limit=None):
+        """Deletes the keys matching the glob-style ``pattern``.
+
+        Returns the number of deleted keys.  ``rate_limit`` caps the number of
+        keys deleted per second.
+        """
         raise NotImplementedError
 
     def lock(
@@ -470,20 +1414,119 @@ class BaseRedisCache(BaseCache):
 
         return value
 
-    def _reinsert_keys(self, client):
-        keys = list(client.scan_iter(match='*'))
-        for key in keys:
-            timeout = client.ttl(key)
-            value = self.get_value(client.get(key))
-            if timeout is None:
-                client.set(key, self.prep_value(value))
-
-    def reinsert_keys(self):
+    def _reinsert_keys(self, client, cursor=0, count=None, rate_limit=None, callback=None):
         """
-        Reinsert cache entries using the current pickle protocol version.
+        Rewrites every key on ``client`` with the current serializer,
+        compressor and pickle protocol, keeping its remaining time to live.
+
+        Each SCAN page is read with one pipeline of GET commands, and its
+        writes are pipelined with the SCAN for the next page.  Keys are only
+        rewritten if they have not changed since they were read.  Once the
+        writes of a page are done, ``callback`` is called with the cursor to
+        resume from, or None once the whole keyspace has been walked.  Keys
+        that cannot be decoded are skipped and logged.
+        """
+        throttle = RateLimiter(rate_limit)
+        reinserted = skipped = 0
+        resume_cursor = None
+        pipeline = client.pipeline(transaction=False)
+        pipeline.scan(cursor=cursor, match='*', count=count)
+        while True:
+            cursor, keys = pipeline.execute()[-1]
+            # The writes of the previous page were sent with this SCAN, so
+            # the page can be reported as done.
+            if resume_cursor is not None and callback is not None:
+                callback(resume_cursor)
+
+            if keys:
+                reads = client.pipeline(transaction=False)
+                for key in keys:
+                    reads.get(key)
+                originals = reads.execute(raise_on_error=False)
+
+                chunked = []
+                for key, original in zip(keys, originals):
+                    # Chunked values, stored as hashes, fail to GET and are
+                    # left as they are.
+                    if original is None or isinstance(original, Exception):
+                        continue
+                    try:
+                        value = self.prep_value(self.get_value(original))
+                    except DECODE_ERRORS as e:
+                        # Not a cache value, e.g. a lock token.
+                        logger.debug("Not reinserting key %r: %r", key, e)
+                        skipped += 1
+                        continue
+                    if self.is_chunked(value):
+                        chunked.append((key, value))
+                    else:
+                        pipeline.eval(REWRITE_SCRIPT, 1, key, original, value)
+                        reinserted += 1
+                reinserted += self._reinsert_chunked(client, pipeline, chunked)
+
+            if not cursor:
+                pipeline.execute()
+                if skipped:
+                    logger.warning(
+                        "Skipped %d keys that could not be decoded while reinserting keys", skipped
+                    )
+                if callback is not None:
+                    callback(None)
+                return reinserted
+
+            pipeline.scan(cursor=cursor, match='*', count=count)
+            resume_cursor = cursor
+            throttle(len(keys))
+
+    def _reinsert_chunked(self, client, pipeline, items):
+        """
+        Queues ``(key, value)`` items whose new value is too large for a
+        single key on ``pipeline``, stored in chunks with the remaining time
+        to live of their key.  Returns the number of items queued.
+        """
+        if not items:
+            return 0
+        ttls = client.pipeline(transaction=False)
+        for key, _ in items:
+            ttls.pttl(key)
+        queued = 0
+        for (key, value), ttl in zip(items, ttls.execute()):
+            if ttl == KEY_EXPIRED:
+                continue
+            # Rounded up, so that the key does not expire early.
+            timeout = None if ttl == KEY_NON_VOLATILE else -(-ttl // 1000)
+            self._set(pipeline, key, value, timeout)
+            queued += 1
+        return queued
+
+    def reinsert_keys(self, cursors=None, count=None, rate_limit=None, callback=None):
+        """
+        Reinsert cache entries using the current pickle protocol version,
+        serializer and compressor.
+
+        ``cursors`` maps connection identifiers to the SCAN cursor to resume
+        from; nodes mapped to None are skipped.  ``callback`` is called with
+        the connection identifier and cursor after every page, so progress can
+        be saved and passed back in as ``cursors``.  ``rate_limit`` caps the
+        number of keys processed per second on each node.
+
+        Returns the number of reinserted keys.
         """
         raise NotImplementedError
 
+    def _reinsert_node(self, identifier, cursors, count, rate_limit, callback):
+        cursors = cursors or {}
+        if identifier in cursors and cursors[identifier] is None:
+            return 0
+        node_callback = None if callback is None else partial(callback, identifier)
+        return self._reinsert_keys(
+            self.clients[identifier],
+            cursor=cursors.get(identifier, 0),
+            count=count,
+            rate_limit=rate_limit,
+            callback=node_callback,
+        )
+
     @get_client(write=True)
     def persist(self, client, key):
         """Remove the timeout on a key.
@@ -493,3 +1536,12 @@ class BaseRedisCache(BaseCache):
         Returns True if successful and False if not.
         """
         return client.persist(key)
+
+    def connection_stats(self):
+        """Returns the statistics of the connection pool of every server, by
+        connection identifier.
+        """
+        return {
+            identifier: client.connection_pool.stats()
+            for identifier, client in self.clients.items()
+        }
@@ -5,17 +5,41 @@ class RedisDummyCache(DummyCache):
     def ttl(self, key):
         return 0
 
-    def delete_pattern(self, pattern, version=None):
+    def ttl_many(self, keys, version=None):
+        return {key: 0 for key in keys}
+
+    def touch_many(self, keys, timeout=None, version=None):
+        return {key: False for key in keys}
+
+    def has_keys(self, keys, version=None):
+        return {key: False for key in keys}
+
+    def delete_pattern(self, pattern, version=None, count=None, rate_limit=None):
+        return 0
+
+    def iter_keys(self, pattern, version=None, count=None):
+        return iter(())
+
+    def iter_items(self, pattern, version=None, count=None):
+        return iter(())
+
+    def get_stream(self, key, prefetch=2, version=None):
         return None
 
     def get_or_set(self, key, default, timeout=None):
         return default() if callable(default) else default
 
-    def reinsert_keys(self):
-        return None
+    def reinsert_keys(self, cursors=None, count=None, rate_limit=None, callback=None):
+        return 0
 
     def persist(self, key):
         return True
 
+    def persist_many(self, keys, version=None):
+        return {key: True for key in keys}
+
     def expire(self, key, timeout):
         return True
+
+    def connection_stats(self):
+        return {}
@@ -1,4 +1,6 @@
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 
 from django.core.cache.backends.base import DEFAULT_TIMEOUT
 
@@ -60,31 +62,33 @@ class ShardedRedisCache(BaseRedisCache):
 
     def get_many(self, keys, version=None):
         data = {}
-        clients = self.shard(keys, version=version)
+        versioned_key_to_key = {self.make_key(key, version=version): key for key in keys}
+        clients = self.shard(versioned_key_to_key.values(), version=version)
         for client, versioned_keys in clients.items():
-            versioned_keys = [self.make_key(key, version=version) for key in keys]
+            original_keys = [versioned_key_to_key[key] for key in versioned_keys]
             data.update(
-                self._get_many(client, keys, versioned_keys=versioned_keys)
+                self._get_many(client, original_keys, versioned_keys=versioned_keys)
             )
         return data
 
-    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, timeouts=None):
         """
         Set multiple values in the cache at once from a dict of key/value pairs.
 
         If timeout is given, that timeout will be used for the key; otherwise
-        the default cache timeout will be used.
+        the default cache timeout will be used.  ``timeouts`` maps keys to
+        their own timeout.
         """
-        timeout = self.get_timeout(timeout)
+        timeouts = self.get_timeouts(data, timeout, timeouts)
         versioned_key_to_key = {self.make_key(key, version=version): key for key in data.keys()}
         clients = self.shard(versioned_key_to_key.values(), write=True, version=version)
 
         for client, versioned_keys in clients.items():
-            pipeline = client.pipeline()
+            items = []
             for versioned_key in versioned_keys:
-                value = self.prep_value(data[versioned_key_to_key[versioned_key]])
-                self._set(pipeline, versioned_key, value, timeout)
-            pipeline.execute()
+                key = versioned_key_to_key[versioned_key]
+                items.append((versioned_key, data[key], timeouts[key]))
+            self._set_many(client, items)
 
     def incr_version(self, key, delta=1, version=None):
         """
@@ -105,14 +109,46 @@ class ShardedRedisCache(BaseRedisCache):
     # Extra api methods #
     #####################
 
-    def delete_pattern(self, pattern, version=None):
+    def iter_keys(self, pattern, version=None, count=None):
+        """
+        Yields the keys matching the glob-style ``pattern`` from every shard.
+        """
         pattern = self.make_key(pattern, version=version)
-        for client in self.clients.values():
-            self._delete_pattern(client, pattern)
+        return chain.from_iterable(
+            self._iter_keys(client, pattern, version=version, count=count)
+            for client in self.clients.values()
+        )
 
-    def reinsert_keys(self):
+    def iter_items(self, pattern, version=None, count=None):
+        """
+        Yields ``(key, value)`` pairs for the keys matching ``pattern`` from
+        every shard.
+        """
+        pattern = self.make_key(pattern, version=version)
+        return chain.from_iterable(
+            self._iter_items(client, pattern, version=version, count=count)
+            for client in self.clients.values()
+        )
+
+    def delete_pattern(self, pattern, version=None, count=None, rate_limit=None):
+        pattern = self.make_key(pattern, version=version)
+        return sum(
+            self._delete_pattern(client, pattern, count=count, rate_limit=rate_limit)
+            for client in self.clients.values()
+        )
+
+    def reinsert_keys(self, cursors=None, count=None, rate_limit=None, callback=None):
         """
         Reinsert cache entries using the current pickle protocol version.
+
+        Shards are processed concurrently, one thread per shard.
         """
-        for client in self.clients.values():
-            self._reinsert_keys(client)
+        with ThreadPoolExecutor(max_workers=len(self.clients)) as executor:
+            futures = [
+                executor.submit(
+                    self._reinsert_node,
+                    identifier, cursors, count, rate_limit, callback,
+                )
+                for identifier in self.clients
+            ]
+        return sum(future.result() for future in futures)
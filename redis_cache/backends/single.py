@@ -54,21 +54,20 @@ class RedisCache(BaseRedisCache):
         versioned_keys = self.make_keys(keys, version=version)
         return self._get_many(self.master_client, keys, versioned_keys=versioned_keys)
 
-    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, timeouts=None):
         """
         Set multiple values in the cache at once from a dict of key/value pairs.
 
         If timeout is given, that timeout will be used for the key; otherwise
-        the default cache timeout will be used.
+        the default cache timeout will be used.  ``timeouts`` maps keys to
+        their own timeout.
         """
-        timeout = self.get_timeout(timeout)
-
-        pipeline = self.master_client.pipeline()
-        for key, value in data.items():
-            value = self.prep_value(value)
-            versioned_key = self.make_key(key, version=version)
-            self._set(pipeline, versioned_key, value, timeout)
-        pipeline.execute()
+        timeouts = self.get_timeouts(data, timeout, timeouts)
+        items = [
+            (self.make_key(key, version=version), value, timeouts[key])
+            for key, value in data.items()
+        ]
+        self._set_many(self.master_client, items)
 
     def incr_version(self, key, delta=1, version=None):
         """
@@ -88,12 +87,31 @@ class RedisCache(BaseRedisCache):
     # Extra api methods #
     #####################
 
-    def delete_pattern(self, pattern, version=None):
+    def iter_keys(self, pattern, version=None, count=None):
+        """
+        Yields the keys matching the glob-style ``pattern``.
+        """
+        pattern = self.make_key(pattern, version=version)
+        return self._iter_keys(self.master_client, pattern, version=version, count=count)
+
+    def iter_items(self, pattern, version=None, count=None):
+        """
+        Yields ``(key, value)`` pairs for the keys matching ``pattern``.
+        """
+        pattern = self.make_key(pattern, version=version)
+        return self._iter_items(self.master_client, pattern, version=version, count=count)
+
+    def delete_pattern(self, pattern, version=None, count=None, rate_limit=None):
         pattern = self.make_key(pattern, version=version)
-        self._delete_pattern(self.master_client, pattern)
+        return self._delete_pattern(
+            self.master_client, pattern, count=count, rate_limit=rate_limit
+        )
 
-    def reinsert_keys(self):
+    def reinsert_keys(self, cursors=None, count=None, rate_limit=None, callback=None):
         """
         Reinsert cache entries using the current pickle protocol version.
         """
-        self._reinsert_keys(self.master_client)
+        return self._reinsert_node(
+            self.master_client.connection_pool.connection_identifier,
+            cursors, count, rate_limit, callback,
+        )
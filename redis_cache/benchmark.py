@@ -0,0 +1,131 @@
+"""
+Measures how serializer and compressor combinations perform on sample values.
+"""
+from itertools import product
+import time
+
+from redis_cache.utils import import_class
+
+
+DEFAULT_SERIALIZERS = [
+    'redis_cache.serializers.PickleSerializer',
+    'redis_cache.serializers.JSONSerializer',
+    'redis_cache.serializers.MSGPackSerializer',
+    'redis_cache.serializers.YAMLSerializer',
+    'redis_cache.serializers.OrjsonSerializer',
+]
+
+DEFAULT_COMPRESSORS = [
+    'redis_cache.compressors.NoopCompressor',
+    'redis_cache.compressors.ZLibCompressor',
+    'redis_cache.compressors.BZip2Compressor',
+    'redis_cache.compressors.ZstdCompressor',
+    'redis_cache.compressors.LZ4Compressor',
+]
+
+
+def percentile(timings, percent):
+    """
+    Returns the ``percent`` percentile of sorted ``timings``.
+    """
+    index = int(round(percent / 100.0 * (len(timings) - 1)))
+    return timings[index]
+
+
+def benchmark(serializer, compressor, values, rounds=1):
+    """
+    Encodes and decodes every value ``rounds`` times.
+
+    Returns a dict with the encode and decode throughput in values per second,
+    the p50 and p99 latency in microseconds, and the total stored bytes.
+    """
+    encode_timings, decode_timings = [], []
+    stored_bytes = 0
+    clock = time.perf_counter
+    for _ in range(rounds):
+        stored_bytes = 0
+        for value in values:
+            start = clock()
+            encoded = compressor.compress(serializer.serialize(value))
+            encode_timings.append(clock() - start)
+
+            start = clock()
+            serializer.deserialize(compressor.decompress(encoded))
+            decode_timings.append(clock() - start)
+
+            stored_bytes += len(encoded)
+
+    result = {'bytes': stored_bytes}
+    for name, timings in (('encode', encode_timings), ('decode', decode_timings)):
+        timings.sort()
+        total = sum(timings)
+        result[name] = {
+            'throughput': len(timings) / total if total else 0.0,
+            'p50': percentile(timings, 50) * 1e6,
+            'p99': percentile(timings, 99) * 1e6,
+        }
+    return result
+
+
+def run(values, serializers=None, compressors=None, rounds=1):
+    """
+    Benchmarks every combination of the ``serializers`` and ``compressors``
+    dotted paths.  Combinations that cannot be imported or cannot encode the
+    values are reported with an ``error`` instead of measurements.
+    """
+    results = []
+    for serializer_path, compressor_path in product(
+        serializers or DEFAULT_SERIALIZERS,
+        compressors or DEFAULT_COMPRESSORS,
+    ):
+        result = {'serializer': serializer_path, 'compressor': compressor_path}
+        try:
+            serializer = import_class(serializer_path)()
+            compressor = import_class(compressor_path)()
+            result.update(benchmark(serializer, compressor, values, rounds=rounds))
+        except Exception as e:
+            result['error'] = '%s: %s' % (type(e).__name__, e)
+        results.append(result)
+    return results
+
+
+def format_table(results):
+    """
+    Formats ``run`` results as a plain text table.
+    """
+    header = (
+        'serializer', 'compressor', 'enc/s', 'enc p50', 'enc p99',
+        'dec/s', 'dec p50', 'dec p99', 'bytes',
+    )
+    rows = [header]
+    for result in results:
+        names = (
+            result['serializer'].rsplit('.', 1)[-1],
+            result['compressor'].rsplit('.', 1)[-1],
+        )
+        if 'error' in result:
+            rows.append(names + (result['error'],))
+            continue
+        rows.append(names + (
+            '%.0f' % result['encode']['throughput'],
+            '%.1fus' % result['encode']['p50'],
+            '%.1fus' % result['encode']['p99'],
+            '%.0f' % result['decode']['throughput'],
+            '%.1fus' % result['decode']['p50'],
+            '%.1fus' % result['decode']['p99'],
+            '%d' % result['bytes'],
+        ))
+
+    # Errors span the measurement columns, so only the names of failed
+    # combinations count towards the column widths.
+    widths = [
+        max(len(row[i]) for row in rows if i < 2 or len(row) == len(header))
+        for i in range(len(header))
+    ]
+    lines = []
+    for row in rows:
+        cells = [cell.ljust(width) for cell, width in zip(row, widths)]
+        if len(row) < len(header):
+            cells[-1] = row[-1]
+        lines.append('  '.join(cells).rstrip())
+    return '\n'.join(lines)
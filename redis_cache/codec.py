@@ -0,0 +1,97 @@
+"""
+Pools of threads or processes encoding and decoding large batches of values.
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import os
+import threading
+
+from redis_cache.utils import chunks
+
+
+# Executors shared by the caches of this process, by kind, number of workers
+# and, for process pools, cache settings.
+_executors = {}
+_executors_lock = threading.Lock()
+
+# Caches built by process pool workers, by cache settings.
+_worker_caches = {}
+
+
+def get_worker_cache(settings):
+    cache_class, server, params = settings
+    key = (cache_class, repr(server), repr(params))
+    cache = _worker_caches.get(key)
+    if cache is None:
+        cache = _worker_caches[key] = cache_class(server, params)
+    return cache
+
+
+def encode_values(settings, values):
+    return get_worker_cache(settings).encode_values(values)
+
+
+def decode_values(settings, originals):
+    return get_worker_cache(settings).decode_values(originals)
+
+
+class CodecPool(object):
+    """
+    Encodes and decodes batches of at least ``min_items`` values in slices,
+    one per worker, with a pool of threads, or of processes if ``processes``
+    is set.
+
+    Process pool workers build their own copy of the cache from its settings,
+    so the values, the settings and the results must be picklable.
+    """
+
+    def __init__(self, cache, processes=False, workers=None, min_items=64):
+        self.cache = cache
+        self.processes = processes
+        self.workers = workers or os.cpu_count() or 1
+        self.min_items = min_items
+        self.settings = (type(cache), cache.server, cache.params)
+
+    def get_executor(self):
+        # Executors do not survive a fork, so they are not shared with
+        # children.
+        if self.processes:
+            cache_class, server, params = self.settings
+            key = (os.getpid(), 'process', self.workers, cache_class, repr(server), repr(params))
+        else:
+            key = (os.getpid(), 'thread', self.workers)
+        executor = _executors.get(key)
+        if executor is None:
+            with _executors_lock:
+                executor = _executors.get(key)
+                if executor is None:
+                    executor_class = ProcessPoolExecutor if self.processes else ThreadPoolExecutor
+                    executor = _executors[key] = executor_class(max_workers=self.workers)
+        return executor
+
+    def map(self, items, local, remote):
+        """
+        Returns the results of ``local`` for ``items``, computed in parallel
+        on slices of ``items`` for large batches.  Process pools call
+        ``remote`` with the cache settings instead.
+        """
+        if len(items) < self.min_items:
+            return local(items)
+        size = -(-len(items) // self.workers)
+        executor = self.get_executor()
+        if self.processes:
+            futures = [
+                executor.submit(remote, self.settings, batch)
+                for batch in chunks(items, size)
+            ]
+        else:
+            futures = [executor.submit(local, batch) for batch in chunks(items, size)]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    def prep_values(self, values):
+        return self.map(values, self.cache.encode_values, encode_values)
+
+    def get_values(self, originals):
+        return self.map(originals, self.cache.decode_values, decode_values)
@@ -1,3 +1,5 @@
+import threading
+import time
 import zlib
 
 try:
@@ -5,21 +7,55 @@ try:
 except ImportError:
     pass
 
+try:
+    import zstandard
+except ImportError:
+    pass
+
+try:
+    import lz4.frame
+except ImportError:
+    pass
+
+
+class DecompressionError(ValueError):
+    """
+    Raised by compressors for values they cannot decompress, such as values
+    compressed with a dictionary that is no longer loaded.  The cache treats
+    these values as missing.
+    """
+
 
 class BaseCompressor(object):
 
+    # Id stored in the frame header of compressed values.  Compressors
+    # without an id write unframed values.
+    compressor_id = None
+
     def __init__(self, **kwargs):
         super(BaseCompressor, self).__init__()
 
+    def bind(self, cache):
+        """
+        Called with the cache backend the compressor is configured for.
+        """
+        pass
+
     def compress(self, value):
         raise NotImplementedError
 
     def decompress(self, value):
+        """
+        Returns the decompressed ``value``.  Raises ``DecompressionError``
+        for values that cannot be decompressed.
+        """
         raise NotImplementedError
 
 
 class NoopCompressor(BaseCompressor):
 
+    compressor_id = 0
+
     def compress(self, value):
         return value
 
@@ -29,6 +65,8 @@ class NoopCompressor(BaseCompressor):
 
 class ZLibCompressor(BaseCompressor):
 
+    compressor_id = 1
+
     def __init__(self, level=6):
         self.level = level
         super(ZLibCompressor, self).__init__()
@@ -37,11 +75,16 @@ class ZLibCompressor(BaseCompressor):
         return zlib.compress(value, self.level)
 
     def decompress(self, value):
-        return zlib.decompress(value)
+        try:
+            return zlib.decompress(value)
+        except zlib.error as e:
+            raise DecompressionError(str(e))
 
 
 class BZip2Compressor(BaseCompressor):
 
+    compressor_id = 2
+
     def __init__(self, compresslevel=9):
         self.compresslevel = compresslevel
         super(BZip2Compressor, self).__init__()
@@ -50,4 +93,119 @@ class BZip2Compressor(BaseCompressor):
         return bz2.compress(value, compresslevel=self.compresslevel)
 
     def decompress(self, value):
-        return bz2.decompress(value)
+        try:
+            return bz2.decompress(value)
+        except (OSError, EOFError) as e:
+            raise DecompressionError(str(e))
+
+
+class ZstdCompressor(BaseCompressor):
+    """
+    Zstandard compressor.
+
+    A dictionary trained on sample values, loaded from the file at
+    ``dictionary`` or the redis key ``dictionary_key``, makes compression
+    worthwhile for small values.  Values compressed with a dictionary can only
+    be decompressed with the same dictionary: zstd records its id in every
+    frame, and values compressed with another dictionary, or read before the
+    dictionary is loaded, are treated as missing.
+    """
+
+    compressor_id = 3
+
+    # Seconds between attempts to load a dictionary key that does not exist.
+    dictionary_retry_interval = 60
+
+    def __init__(self, level=3, dictionary=None, dictionary_key=None):
+        self.level = level
+        self.dictionary = dictionary
+        self.dictionary_key = dictionary_key
+        self.cache = None
+        self._dictionary = None
+        self._dictionary_checked_at = None
+        self._local = threading.local()
+        super(ZstdCompressor, self).__init__()
+
+    def bind(self, cache):
+        self.cache = cache
+
+    def get_dictionary(self):
+        """
+        Returns the compression dictionary, or ``None`` if none is configured
+        or the dictionary key does not exist.
+        """
+        if self._dictionary is None:
+            data = None
+            if self.dictionary is not None:
+                with open(self.dictionary, 'rb') as f:
+                    data = f.read()
+            elif self.dictionary_key is not None and self.cache is not None:
+                now = time.monotonic()
+                checked_at = self._dictionary_checked_at
+                if checked_at is None or now - checked_at >= self.dictionary_retry_interval:
+                    self._dictionary_checked_at = now
+                    client = self.cache.get_client(self.dictionary_key)
+                    data = client.get(self.dictionary_key)
+            if data is not None:
+                self._dictionary = zstandard.ZstdCompressionDict(data)
+        return self._dictionary
+
+    def get_contexts(self):
+        # Compression contexts must not be shared between threads, and are
+        # rebuilt once the dictionary is loaded.
+        dictionary = self.get_dictionary()
+        contexts = getattr(self._local, 'contexts', None)
+        if contexts is None or contexts[0] is not dictionary:
+            contexts = self._local.contexts = (
+                dictionary,
+                zstandard.ZstdCompressor(level=self.level, dict_data=dictionary),
+                zstandard.ZstdDecompressor(dict_data=dictionary),
+            )
+        return contexts
+
+    def compress(self, value):
+        return self.get_contexts()[1].compress(value)
+
+    def decompress(self, value):
+        try:
+            dict_id = zstandard.get_frame_parameters(value).dict_id
+            dictionary, _, decompressor = self.get_contexts()
+            if dict_id and (dictionary is None or dictionary.dict_id() != dict_id):
+                raise DecompressionError(
+                    "Value was compressed with zstd dictionary %d, which is not loaded" % dict_id
+                )
+            return decompressor.decompress(value)
+        except zstandard.ZstdError as e:
+            raise DecompressionError(str(e))
+
+
+class LZ4Compressor(BaseCompressor):
+
+    compressor_id = 4
+
+    def __init__(self, compression_level=0):
+        self.compression_level = compression_level
+        super(LZ4Compressor, self).__init__()
+
+    def compress(self, value):
+        return lz4.frame.compress(value, compression_level=self.compression_level)
+
+    def decompress(self, value):
+        try:
+            return lz4.frame.decompress(value)
+        except RuntimeError as e:
+            raise DecompressionError(str(e))
+
+
+# Compressors used to read framed values, by frame id.  Custom compressors
+# with a ``compressor_id`` between 5 and 7 can be added to this registry.
+COMPRESSORS = {
+    compressor_class.compressor_id: compressor_class
+    for compressor_class in (
+        NoopCompressor,
+        ZLibCompressor,
+        BZip2Compressor,
+        ZstdCompressor,
+        LZ4Compressor,
+    )
+}
@@ -1,11 +1,216 @@
-from redis.connection import UnixDomainSocketConnection, Connection, SSLConnection
+from collections import deque
+import os
+import threading
+import time
+import weakref
+
+from redis.connection import (
+    BlockingConnectionPool, ConnectionPool, UnixDomainSocketConnection,
+    Connection, SSLConnection,
+)
+from redis.exceptions import ConnectionError, ResponseError, TimeoutError
+
+
+class CachePoolMixin(object):
+    """
+    Records checkout statistics for a redis connection pool and opens
+    connections ahead of time.  ``CacheConnectionPool`` mixes it into the
+    connection pool class of every cache.
+
+    Pools are reset in a forked child the first time they are used: the
+    connections inherited from the parent are closed without shutting down
+    the parent's sockets, and ``warm_connections`` are opened again.
+
+    Connections idle for more than ``max_idle_time`` seconds, or opened more
+    than ``max_connection_age`` seconds ago, are reconnected when they are
+    checked out, before any command is sent on them.
+
+    Pools that set ``record_checkouts`` to False do not count checkouts or
+    time them, which takes a lock shared by every thread.
+    """
+
+    # Number of connections opened ahead of time, and again after a fork.
+    warm_connections = 0
+    max_idle_time = None
+    max_connection_age = None
+    record_checkouts = True
+
+    def reset(self):
+        pid = getattr(self, 'pid', None)
+        forked = pid is not None and pid != os.getpid()
+        if forked:
+            for connection in self.get_connections():
+                connection.disconnect()
+        super(CachePoolMixin, self).reset()
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._exhausted = 0
+        self._recycled = 0
+        if forked and self.warm_connections:
+            self.warm(self.warm_connections)
+
+    def get_connections(self):
+        """
+        Returns every connection the pool holds.
+        """
+        if isinstance(self, BlockingConnectionPool):
+            connections = list(self._connections)
+        else:
+            connections = list(self._available_connections)
+            connections.extend(self._in_use_connections)
+        connections.extend(getattr(self, '_thread_connections', ()))
+        multiplexer = getattr(self, '_multiplexer', None)
+        if multiplexer is not None:
+            connections.append(multiplexer.connection)
+        return connections
+
+    def get_connection(self, command_name, *keys, **options):
+        record_checkouts = self.record_checkouts
+        if record_checkouts:
+            start = time.perf_counter()
+        try:
+            connection = super(CachePoolMixin, self).get_connection(
+                command_name, *keys, **options
+            )
+        except ConnectionError:
+            if self.is_exhausted():
+                with self._stats_lock:
+                    self._exhausted += 1
+            raise
+        if self.max_idle_time is not None or self.max_connection_age is not None:
+            self.recycle_stale(connection)
+        if not record_checkouts:
+            return connection
+        wait_time = time.perf_counter() - start
+        with self._stats_lock:
+            self._checkouts += 1
+            self._wait_time += wait_time
+            if wait_time > self._max_wait_time:
+                self._max_wait_time = wait_time
+        return connection
+
+    def make_connection(self):
+        connection = super(CachePoolMixin, self).make_connection()
+        connection.connected_at = time.monotonic()
+        return connection
+
+    def release(self, connection):
+        connection.last_used = time.monotonic()
+        super(CachePoolMixin, self).release(connection)
+
+    def is_stale(self, connection, now):
+        last_used = getattr(connection, 'last_used', None)
+        if (self.max_idle_time is not None and last_used is not None
+                and now - last_used > self.max_idle_time):
+            return True
+        connected_at = getattr(connection, 'connected_at', None)
+        return (
+            self.max_connection_age is not None and connected_at is not None
+            and now - connected_at > self.max_connection_age
+        )
+
+    def recycle_stale(self, connection):
+        """
+        Reconnects ``connection`` if it has been idle or open for too long.
+        """
+        now = time.monotonic()
+        if not self.is_stale(connection, now):
+            return
+        try:
+            connection.disconnect()
+            connection.connect()
+        except BaseException:
+            self.release(connection)
+            raise
+        connection.connected_at = now
+        with self._stats_lock:
+            self._recycled += 1
+
+    def connection_counts(self):
+        """
+        Returns the number of connections the pool holds, of those in use and
+        of those idle.
+        """
+        if isinstance(self, BlockingConnectionPool):
+            created = len(self._connections)
+            idle = sum(1 for connection in list(self.pool.queue) if connection is not None)
+            return created, created - idle, idle
+        in_use = len(self._in_use_connections)
+        idle = len(self._available_connections)
+        thread_connections = getattr(self, '_thread_connections', None)
+        if thread_connections is not None:
+            # Only the connection of the current thread is idle to it; those
+            # of other threads cannot be checked out.
+            thread_connection = getattr(self._local, 'thread_connection', None)
+            in_use += len(thread_connections)
+            if (thread_connection is not None
+                    and thread_connection.connection not in self._thread_in_use):
+                in_use -= 1
+                idle += 1
+        multiplexer = getattr(self, '_multiplexer', None)
+        if multiplexer is not None:
+            # In use while a batch is being written or read on it.
+            if multiplexer._flushing:
+                in_use += 1
+            else:
+                idle += 1
+        return self._created_connections, in_use, idle
+
+    def is_exhausted(self):
+        created, _, idle = self.connection_counts()
+        return created >= self.max_connections and not idle
+
+    def stats(self):
+        """
+        Returns the number of connections created, in use and idle, the
+        number of checkouts, the total and longest time they waited for a
+        connection, in seconds, the number of checkouts that failed because
+        every connection was in use and the number of stale connections
+        reconnected.
+        """
+        created, in_use, idle = self.connection_counts()
+        with self._stats_lock:
+            return {
+                'created': created,
+                'in_use': in_use,
+                'idle': idle,
+                'checkouts': self._checkouts,
+                'wait_time': self._wait_time,
+                'max_wait_time': self._max_wait_time,
+                'exhausted': self._exhausted,
+                'recycled': self._recycled,
+            }
+
+    def warm(self, count):
+        """
+        Opens up to ``count`` connections and returns them to the pool.
+        Warm-up is best-effort: it stops at the first connection that fails
+        or times out.  Returns the number of connections opened.
+        """
+        connections = []
+        try:
+            for _ in range(min(count, self.max_connections)):
+                connections.append(
+                    super(CachePoolMixin, self).get_connection('_')
+                )
+        except (ConnectionError, TimeoutError):
+            pass
+        finally:
+            for connection in connections:
+                self.release(connection)
+        return len(connections)
 
 
 class CacheConnectionPool(object):
 
     def __init__(self):
+        self.pid = os.getpid()
         self._clients = {}
         self._connection_pools = {}
+        self._pool_classes = {}
+        self._registered_at_fork = False
 
     def __contains__(self, server):
         return server in self._clients
@@ -19,6 +224,49 @@ class CacheConnectionPool(object):
         self._clients = {}
         self._connection_pools = {}
 
+    def after_fork(self):
+        """
+        Closes the connections inherited from the parent process and warms
+        the connection pools again.
+        """
+        self.pid = os.getpid()
+        for connection_pool in list(self._connection_pools.values()):
+            connection_pool._checkpid()
+
+    def register_at_fork(self):
+        """
+        Calls ``after_fork`` in child processes right after a fork, rather
+        than when the pools are first used.  Requires Python 3.7.
+        """
+        if not self._registered_at_fork and hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.after_fork)
+            self._registered_at_fork = True
+
+    def stats(self):
+        """
+        Returns the statistics of every connection pool by connection
+        identifier.
+        """
+        return {
+            identifier: pool.stats()
+            for identifier, pool in self._connection_pools.items()
+        }
+
+    def get_pool_class(self, connection_pool_class):
+        """
+        Returns a subclass of ``connection_pool_class`` recording statistics.
+        """
+        if issubclass(connection_pool_class, CachePoolMixin):
+            return connection_pool_class
+        pool_class = self._pool_classes.get(connection_pool_class)
+        if pool_class is None:
+            pool_class = self._pool_classes[connection_pool_class] = type(
+                connection_pool_class.__name__,
+                (CachePoolMixin, connection_pool_class),
+                {'__module__': connection_pool_class.__module__},
+            )
+        return pool_class
+
     def get_connection_pool(
         self,
         client,
@@ -33,10 +281,19 @@ class CacheConnectionPool(object):
         connection_pool_class_kwargs=None,
         socket_timeout=None,
         socket_connect_timeout=None,
+        socket_keepalive=False,
+        socket_keepalive_options=None,
+        health_check_interval=0,
+        warm_connections=0,
+        max_idle_time=None,
+        max_connection_age=None,
         **kwargs
     ):
         connection_identifier = (host, port, db, unix_socket_path)
 
+        if self.pid != os.getpid():
+            self.after_fork()
+
         self._clients[connection_identifier] = client
 
         pool = self._connection_pools.get(connection_identifier)
@@ -54,10 +311,13 @@ class CacheConnectionPool(object):
                 'connection_class': connection_class,
                 'parser_class': parser_class,
                 'socket_timeout': socket_timeout,
+                'health_check_interval': health_check_interval,
             }
 
             if not issubclass(connection_class, UnixDomainSocketConnection):
                 kwargs['socket_connect_timeout'] = socket_connect_timeout
+                kwargs['socket_keepalive'] = socket_keepalive
+                kwargs['socket_keepalive_options'] = socket_keepalive_options
 
             kwargs.update(connection_pool_class_kwargs)
 
@@ -69,11 +329,353 @@ class CacheConnectionPool(object):
             else:
                 kwargs['path'] = unix_socket_path
 
-            pool = connection_pool_class(**kwargs)
+            pool = self.get_pool_class(connection_pool_class)(**kwargs)
 
             self._connection_pools[connection_identifier] = pool
             pool.connection_identifier = connection_identifier
+            pool.max_idle_time = max_idle_time
+            pool.max_connection_age = max_connection_age
+
+            if warm_connections:
+                pool.warm_connections = warm_connections
+                pool.warm(warm_connections)
 
         return pool
 
+
+class PendingReply(object):
+    """
+    Placeholder for the response to a command that was handed to a
+    ``Multiplexer``.  The thread waiting on it may be asked to lead the next
+    flush instead of being handed its response.
+
+    Waiting is bounded by the socket timeout of the multiplexed connection.
+    Commands given up on before they were sent are dropped.
+    """
+
+    def __init__(self, multiplexer):
+        self.multiplexer = multiplexer
+        self._event = threading.Event()
+        self._leader = False
+        self._done = False
+        self._value = None
+        self._exception = None
+        self.abandoned = False
+
+    def set(self, value=None, exception=None):
+        self._value = value
+        self._exception = exception
+        self._done = True
+        self._event.set()
+
+    def promote(self):
+        self._leader = True
+        self._event.set()
+
+    def get(self):
+        multiplexer = self.multiplexer
+        while not self._done:
+            if self._leader:
+                self._leader = False
+                multiplexer.flush()
+            elif not self._event.wait(multiplexer.connection.socket_timeout):
+                with multiplexer._lock:
+                    # Leadership is handed over under the lock, so a reply
+                    # promoted meanwhile still leads the flush.
+                    if not self._leader and not self._done:
+                        self.abandoned = True
+                        raise TimeoutError(
+                            "Timeout waiting for the reply to a multiplexed command"
+                        )
+        if self._exception is not None:
+            raise self._exception
+        return self._value
+
+
+class Multiplexer(object):
+    """
+    Coalesces the commands issued concurrently by many threads into a single
+    write on one shared connection and hands each reply back to its caller.
+
+    The first thread to queue a command while no flush is in progress becomes
+    the leader: it writes everything queued so far, reads the replies in
+    order and then passes leadership to the first command queued in the
+    meantime.
+
+    The leader hands the connection to ``prepare``, if given, before writing
+    each batch.
+    """
+
+    def __init__(self, connection, max_pipeline_size=None, prepare=None):
+        self.connection = connection
+        self.max_pipeline_size = max_pipeline_size
+        self.prepare = prepare
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._pending = deque()
+        self._flushing = False
+
+    def submit(self, args):
+        reply = PendingReply(self)
+        with self._lock:
+            self._pending.append((args, reply))
+            if not self._flushing:
+                self._flushing = True
+                reply.promote()
+        return reply
+
+    def flush(self):
+        with self._lock:
+            size = len(self._pending)
+            if self.max_pipeline_size:
+                size = min(size, self.max_pipeline_size)
+            batch = [self._pending.popleft() for _ in range(size)]
+            batch = [(args, reply) for args, reply in batch if not reply.abandoned]
+        try:
+            if batch:
+                self._execute(batch)
+        finally:
+            with self._lock:
+                while self._pending and self._pending[0][1].abandoned:
+                    self._pending.popleft()
+                if self._pending:
+                    self._pending[0][1].promote()
+                else:
+                    self._flushing = False
+
+    def _execute(self, batch):
+        connection = self.connection
+        replies = deque(reply for _, reply in batch)
+        try:
+            if self.prepare is not None:
+                self.prepare(connection)
+            connection.send_packed_command(
+                connection.pack_commands([args for args, _ in batch])
+            )
+            while replies:
+                try:
+                    response = connection.read_response()
+                except ResponseError as e:
+                    replies.popleft().set(exception=e)
+                else:
+                    replies.popleft().set(response)
+        except BaseException as e:
+            connection.disconnect()
+            while replies:
+                replies.popleft().set(exception=e)
+        finally:
+            connection.last_used = time.monotonic()
+
+    def disconnect(self):
+        self.connection.disconnect()
+
+
+class AutoPipelineConnection(object):
+    """
+    Stand-in for a ``redis.connection.Connection`` that routes its commands
+    through the multiplexer of an ``AutoPipelineConnectionPool``.
+    """
+
+    def __init__(self, multiplexer):
+        self.multiplexer = multiplexer
+        self.pid = multiplexer.pid
+        self.retry_on_timeout = multiplexer.connection.retry_on_timeout
+        self._replies = deque()
+
+    def connect(self):
+        pass
+
+    def disconnect(self):
+        self._replies.clear()
+
+    def can_read(self, timeout=0):
+        return False
+
+    def send_command(self, *args, **kwargs):
+        self._replies.append(self.multiplexer.submit(args))
+
+    def read_response(self):
+        return self._replies.popleft().get()
+
+
+class AutoPipelineConnectionPool(ConnectionPool):
+    """
+    Connection pool that shares a single connection between every thread and
+    transparently pipelines the commands they issue concurrently.
+
+    Commands that need a connection of their own (transactions, pipelines,
+    pub/sub and blocking commands) are still served from regular pooled
+    connections.
+
+    The shared connection is checked before every batch written on it, like
+    a pooled connection is when it is checked out: it is reconnected if it
+    has unread data or has been idle or open for too long.
+    """
+    exclusive_commands = frozenset([
+        '_', 'MULTI', 'WATCH', 'pubsub', 'MONITOR', 'SELECT', 'CLIENT',
+        'BLPOP', 'BRPOP', 'BRPOPLPUSH', 'BZPOPMIN', 'BZPOPMAX',
+        'XREAD', 'XREADGROUP', 'WAIT',
+    ])
+
+    def __init__(self, max_pipeline_size=None, **kwargs):
+        self.max_pipeline_size = max_pipeline_size
+        super(AutoPipelineConnectionPool, self).__init__(**kwargs)
+
+    def reset(self):
+        super(AutoPipelineConnectionPool, self).reset()
+        self._multiplexer = None
+
+    def get_multiplexer(self):
+        self._checkpid()
+        multiplexer = self._multiplexer
+        if multiplexer is None:
+            with self._lock:
+                if self._multiplexer is None:
+                    self._multiplexer = Multiplexer(
+                        self.make_connection(),
+                        max_pipeline_size=self.max_pipeline_size,
+                        prepare=self.prepare_multiplexer_connection,
+                    )
+                multiplexer = self._multiplexer
+        return multiplexer
+
+    def prepare_multiplexer_connection(self, connection):
+        connection.connect()
+        if connection.can_read():
+            # Replies left over from an interrupted batch.
+            connection.disconnect()
+            connection.connect()
+        if (getattr(self, 'max_idle_time', None) is not None
+                or getattr(self, 'max_connection_age', None) is not None):
+            self.recycle_stale(connection)
+
+    def get_connection(self, command_name, *keys, **options):
+        if command_name in self.exclusive_commands:
+            return super(AutoPipelineConnectionPool, self).get_connection(
+                command_name, *keys, **options
+            )
+        return AutoPipelineConnection(self.get_multiplexer())
+
+    def release(self, connection):
+        multiplexer = self._multiplexer
+        if isinstance(connection, AutoPipelineConnection) or (
+                multiplexer is not None and connection is multiplexer.connection):
+            return
+        super(AutoPipelineConnectionPool, self).release(connection)
+
+    def disconnect(self, inuse_connections=True):
+        super(AutoPipelineConnectionPool, self).disconnect(inuse_connections)
+        if self._multiplexer is not None:
+            self._multiplexer.disconnect()
+
+
+class ThreadConnection(object):
+    """
+    Holds the connection of a thread in a ``ThreadAffineConnectionPool``.
+    Dropped, and its connection handed back to the pool, when the thread
+    exits.
+    """
+    __slots__ = ('connection', '__weakref__')
+
+    def __init__(self, connection):
+        self.connection = connection
+
+
+class ThreadAffineConnectionPool(ConnectionPool):
+    """
+    Connection pool that gives each thread a connection of its own, so
+    commands do not contend on the pool lock.
+
+    At most ``max_thread_connections`` threads get a connection of their
+    own, by default half of ``max_connections``, and at least one connection
+    is always left to the shared pool.  Other threads, and threads already
+    using their own connection (pipelines, pub/sub), are served from the
+    shared pool.  The connection of a thread that exits is returned to the
+    shared pool.
+
+    Checkouts are not counted in the pool statistics unless
+    ``record_checkouts`` is set, since that takes a lock shared by every
+    thread.
+    """
+
+    def __init__(self, max_thread_connections=None, record_checkouts=False, **kwargs):
+        self.record_checkouts = record_checkouts
+        super(ThreadAffineConnectionPool, self).__init__(**kwargs)
+        if max_thread_connections is None:
+            max_thread_connections = self.max_connections // 2
+        self.max_thread_connections = max_thread_connections
+
+    def reset(self):
+        super(ThreadAffineConnectionPool, self).reset()
+        self._local = threading.local()
+        self._thread_connections = set()
+        self._thread_in_use = set()
+
+    def get_thread_connection(self):
+        """
+        Returns the connection of the current thread, creating it if the
+        pool allows it, or None.
+        """
+        thread_connection = getattr(self._local, 'thread_connection', None)
+        if thread_connection is not None:
+            return thread_connection.connection
+        if len(self._thread_connections) >= self.max_thread_connections:
+            return None
+        with self._lock:
+            # The shared pool keeps room for the other threads.
+            if (len(self._thread_connections) >= self.max_thread_connections
+                    or self._created_connections >= self.max_connections - 1):
+                return None
+            connection = self.make_connection()
+            self._thread_connections.add(connection)
+        thread_connection = self._local.thread_connection = ThreadConnection(connection)
+        weakref.finalize(thread_connection, self.thread_exited, self._local, connection)
+        return connection
+
+    def thread_exited(self, local, connection):
+        with self._lock:
+            # Pools reset after a fork have already dropped the connection.
+            if local is not self._local:
+                return
+            self._thread_connections.discard(connection)
+            self._thread_in_use.discard(connection)
+            self._available_connections.append(connection)
+
+    def get_connection(self, command_name, *keys, **options):
+        self._checkpid()
+        connection = self.get_thread_connection()
+        if connection is None or connection in self._thread_in_use:
+            return super(ThreadAffineConnectionPool, self).get_connection(
+                command_name, *keys, **options
+            )
+        self._thread_in_use.add(connection)
+        try:
+            connection.connect()
+            try:
+                if connection.can_read():
+                    raise ConnectionError('Connection has data')
+            except ConnectionError:
+                connection.disconnect()
+                connection.connect()
+                if connection.can_read():
+                    raise ConnectionError('Connection not ready')
+        except BaseException:
+            self.release(connection)
+            raise
+        return connection
+
+    def release(self, connection):
+        if connection in self._thread_connections:
+            self._thread_in_use.discard(connection)
+            return
+        super(ThreadAffineConnectionPool, self).release(connection)
+
+    def disconnect(self, inuse_connections=True):
+        super(ThreadAffineConnectionPool, self).disconnect(inuse_connections)
+        with self._lock:
+            for connection in list(self._thread_connections):
+                if inuse_connections or connection not in self._thread_in_use:
+                    connection.disconnect()
+
+
 pool = CacheConnectionPool()
@@ -1,2 +1,38 @@
 KEY_EXPIRED = -2
 KEY_NON_VOLATILE = -1
+
+# Values written by the cache start with a two byte frame header.  The marker
+# byte never starts a UTF-8, pickle, msgpack, zlib or bzip2 payload, so framed
+# values can be told apart from values written by older versions.  The
+# descriptor byte holds the serializer id in its low nibble and the compressor
+# id in the next three bits; the high bit is reserved.  Serializer id 0 marks
+# raw bytes.
+FRAME_MARKER = b'\xc1'
+FRAME_HEADER_SIZE = 2
+FRAME_SERIALIZER_MASK = 0x0f
+FRAME_COMPRESSOR_MASK = 0x70
+FRAME_COMPRESSOR_SHIFT = 4
+FRAME_RAW_HEADER = FRAME_MARKER + b'\x00'
+
+# Values larger than CHUNK_SIZE are stored as a hash holding the manifest,
+# ``<token>:<chunks>:<size>``, and the chunks under ``<token>:<index>`` fields.
+CHUNK_MANIFEST_FIELD = 'manifest'
+
+# Integers are stored unframed so that INCR and DECR keep working on them.
+INTEGER_MARKERS = frozenset(bytes((byte,)) for byte in b'-0123456789')
+
+
+class Missing(object):
+    """
+    Marks values that are missing, or that cannot be read, in decoded
+    batches.  Pickled by reference, so it survives process pools.
+    """
+
+    def __repr__(self):
+        return '<missing>'
+
+    def __reduce__(self):
+        return 'MISSING'
+
+
+MISSING = Missing()
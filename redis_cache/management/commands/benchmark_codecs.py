@@ -0,0 +1,77 @@
+from itertools import islice
+import json
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+from redis_cache import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares serializer and compressor combinations on sample values, "
+        "reporting throughput, p50/p99 latency and stored bytes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--values',
+            help="JSON file holding a list of sample values.",
+        )
+        parser.add_argument(
+            '--cache', default='default',
+            help="Alias of the cache to sample values from when --values is not given.",
+        )
+        parser.add_argument(
+            '--pattern', default='*',
+            help="Glob-style pattern of the keys to sample.",
+        )
+        parser.add_argument(
+            '--samples', type=int, default=1000,
+            help="Maximum number of values to sample from the cache.",
+        )
+        parser.add_argument(
+            '--serializer', action='append', dest='serializers',
+            help="Dotted path of a serializer class. May be repeated.",
+        )
+        parser.add_argument(
+            '--compressor', action='append', dest='compressors',
+            help="Dotted path of a compressor class. May be repeated.",
+        )
+        parser.add_argument(
+            '--rounds', type=int, default=3,
+            help="Number of times every value is encoded and decoded.",
+        )
+        parser.add_argument(
+            '--json',
+            help="File to write the results to as JSON, or - for stdout.",
+        )
+
+    def handle(self, *args, **options):
+        if options['values']:
+            with open(options['values']) as f:
+                values = json.load(f)
+        else:
+            cache = caches[options['cache']]
+            items = islice(cache.iter_items(options['pattern']), options['samples'])
+            values = [value for _, value in items]
+        if not values:
+            raise CommandError("No sample values were found")
+
+        results = benchmark.run(
+            values,
+            serializers=options['serializers'],
+            compressors=options['compressors'],
+            rounds=options['rounds'],
+        )
+
+        if options['json'] == '-':
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(results, f, indent=2)
+        self.stdout.write(
+            "%d values, %d rounds\n" % (len(values), options['rounds'])
+        )
+        self.stdout.write(benchmark.format_table(results))
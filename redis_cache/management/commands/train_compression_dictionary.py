@@ -0,0 +1,71 @@
+from itertools import islice
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class Command(BaseCommand):
+    help = (
+        "Trains a Zstandard compression dictionary on values sampled from a "
+        "cache, for use with redis_cache.compressors.ZstdCompressor."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cache', default='default',
+            help="Alias of the cache to sample values from.",
+        )
+        parser.add_argument(
+            '--pattern', default='*',
+            help="Glob-style pattern of the keys to sample.",
+        )
+        parser.add_argument(
+            '--samples', type=int, default=10000,
+            help="Maximum number of values to sample.",
+        )
+        parser.add_argument(
+            '--size', type=int, default=112640,
+            help="Size of the dictionary in bytes.",
+        )
+        parser.add_argument(
+            '--output',
+            help="File to write the dictionary to.",
+        )
+        parser.add_argument(
+            '--key',
+            help="Redis key to store the dictionary in.",
+        )
+
+    def handle(self, *args, **options):
+        if zstandard is None:
+            raise CommandError("Training a dictionary requires the 'zstandard' library")
+        if not options['output'] and not options['key']:
+            raise CommandError("Either --output or --key is required")
+
+        cache = caches[options['cache']]
+        items = islice(cache.iter_items(options['pattern']), options['samples'])
+        samples = [cache.serialize(value) for _, value in items]
+        if not samples:
+            raise CommandError("No values matching '%s' were found" % options['pattern'])
+
+        try:
+            dictionary = zstandard.train_dictionary(options['size'], samples)
+        except zstandard.ZstdError as e:
+            raise CommandError("Could not train a dictionary: %s" % e)
+        data = dictionary.as_bytes()
+
+        if options['output']:
+            with open(options['output'], 'wb') as f:
+                f.write(data)
+        if options['key']:
+            key = options['key']
+            cache.get_client(key, write=True).set(key, data)
+
+        self.stdout.write(
+            "Trained a %d byte dictionary on %d values." % (len(data), len(samples))
+        )
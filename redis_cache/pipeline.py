@@ -0,0 +1,300 @@
+from collections import defaultdict
+from itertools import islice, repeat
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+from redis_cache.compressors import DecompressionError
+from redis_cache.constants import MISSING
+from redis_cache.utils import is_wrong_type
+
+
+INCR_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 1 then
+    return redis.call('incrby', KEYS[1], ARGV[1])
+end
+return false
+"""
+
+
+class CacheFuture(object):
+    """
+    The eventual result of a command queued on a ``CachePipeline``.
+    """
+
+    def __init__(self):
+        self._done = False
+        self._value = None
+        self._exception = None
+
+    def __repr__(self):
+        if not self._done:
+            return '<CacheFuture pending>'
+        return '<CacheFuture %r>' % (self._exception or self._value,)
+
+    def set_result(self, value):
+        self._value = value
+        self._done = True
+
+    def set_exception(self, exception):
+        self._exception = exception
+        self._done = True
+
+    def done(self):
+        return self._done
+
+    def result(self):
+        if not self._done:
+            raise RuntimeError('The pipeline has not been executed yet')
+        if self._exception is not None:
+            raise self._exception
+        return self._value
+
+
+class CachePipeline(object):
+    """
+    Batches cache commands and sends them with one round trip per node.
+
+    Every cache method returns a ``CacheFuture`` that is resolved with the
+    deserialized value once the pipeline is executed.  Used as a context
+    manager, the pipeline executes on exit unless an exception was raised.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.reset()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.execute()
+        else:
+            self.reset()
+
+    def __len__(self):
+        return sum(len(callbacks) for callbacks in self._callbacks.values())
+
+    def reset(self):
+        self._pipelines = {}
+        self._callbacks = defaultdict(list)
+        self._finalizers = []
+
+    def get_pipeline(self, client):
+        pipeline = self._pipelines.get(client)
+        if pipeline is None:
+            pipeline = self._pipelines[client] = client.pipeline(transaction=False)
+        return pipeline
+
+    def route(self, key, version=None, write=False):
+        """
+        Returns the redis pipeline for the node owning ``key`` and the
+        versioned key.
+        """
+        versioned_key = self.cache.make_key(key, version=version)
+        client = self.cache.get_client(versioned_key, write=write)
+        return self.get_pipeline(client), versioned_key
+
+    def queue(self, pipeline, callback=None, future=None, errback=None, commands=1):
+        """
+        Registers a future for the last ``commands`` commands queued on
+        ``pipeline``, resolved with the response of the last one.
+        ``errback`` is called with the error of a failed command, and may
+        resolve the future instead.
+        """
+        if future is None:
+            future = CacheFuture()
+        self._callbacks[pipeline].append((future, callback, errback, commands))
+        return future
+
+    def resolved(self, value):
+        future = CacheFuture()
+        future.set_result(value)
+        return future
+
+    def combine(self, futures, combine):
+        """
+        Returns a future resolved by ``combine`` once ``futures`` are resolved.
+        """
+        future = CacheFuture()
+        self._finalizers.append((future, futures, combine))
+        return future
+
+    def execute(self):
+        callbacks, finalizers = self._callbacks, self._finalizers
+        self.reset()
+
+        for pipeline, pending in callbacks.items():
+            try:
+                responses = iter(pipeline.execute(raise_on_error=False))
+            except Exception as e:
+                responses = repeat(e)
+
+            for future, callback, errback, commands in pending:
+                results = list(islice(responses, commands))
+                response = next(
+                    (result for result in results if isinstance(result, Exception)),
+                    results[-1],
+                )
+                if isinstance(response, Exception) and errback is None:
+                    future.set_exception(response)
+                    continue
+                try:
+                    if isinstance(response, Exception):
+                        value = errback(response)
+                    else:
+                        value = response if callback is None else callback(response)
+                except Exception as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(value)
+
+        for future, futures, combine in finalizers:
+            try:
+                future.set_result(combine([f.result() for f in futures]))
+            except Exception as e:
+                future.set_exception(e)
+
+    ####################
+    # Django cache api #
+    ####################
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._set(key, value, timeout, version, _add_only=True)
+
+    def get(self, key, default=None, version=None):
+        pipeline, key = self.route(key, version=version)
+        pipeline.get(key)
+
+        def callback(value):
+            if value is None:
+                return default
+            try:
+                return self.cache.get_value(value)
+            except DecompressionError:
+                return default
+
+        def errback(error):
+            # Chunked values are stored as hashes.
+            if not is_wrong_type(error):
+                raise error
+            return self.cache._get_chunked(self.cache.get_client(key), key, default)
+
+        return self.queue(pipeline, callback, errback=errback)
+
+    def _set(self, key, value, timeout, version, _add_only=False):
+        timeout = self.cache.get_timeout(timeout)
+        if timeout is not None and timeout < 0:
+            return self.resolved(False)
+        pipeline, key = self.route(key, version=version, write=True)
+        # Chunked values are written by several commands.
+        queued = len(pipeline)
+        self.cache._set(pipeline, key, self.cache.prep_value(value), timeout, _add_only=_add_only)
+        return self.queue(pipeline, bool, commands=len(pipeline) - queued)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._set(key, value, timeout, version)
+
+    def delete(self, key, version=None):
+        pipeline, key = self.route(key, version=version, write=True)
+        self.cache._delete(pipeline, key)
+        return self.queue(pipeline)
+
+    def get_many(self, keys, version=None):
+        futures = []
+        for pipeline, keys in self._shard(keys, version).items():
+            original_keys, versioned_keys = zip(*keys)
+            pipeline.mget(versioned_keys)
+
+            def callback(originals, versioned_keys=versioned_keys, original_keys=original_keys):
+                # Chunked values, stored as hashes, are read by MGET as None.
+                client = self.cache.get_client(versioned_keys[0])
+                originals = self.cache._get_chunked_values(client, versioned_keys, originals)
+                values = self.cache.get_values(originals)
+                return {
+                    key: value
+                    for key, value in zip(original_keys, values)
+                    if value is not MISSING
+                }
+
+            futures.append(self.queue(pipeline, callback))
+
+        def combine(results):
+            data = {}
+            for result in results:
+                data.update(result)
+            return data
+
+        return self.combine(futures, combine)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, timeouts=None):
+        keys = list(data)
+        timeouts = timeouts or {}
+        futures = [
+            self.set(key, data[key], timeout=timeouts.get(key, timeout), version=version)
+            for key in keys
+        ]
+
+        def combine(results):
+            return [key for key, result in zip(keys, results) if not result]
+
+        return self.combine(futures, combine)
+
+    def delete_many(self, keys, version=None):
+        futures = []
+        for pipeline, keys in self._shard(keys, version, write=True).items():
+            self.cache._delete(pipeline, *[key for _, key in keys])
+            futures.append(self.queue(pipeline))
+        return self.combine(futures, sum)
+
+    def incr(self, key, delta=1, version=None):
+        pipeline, versioned_key = self.route(key, version=version, write=True)
+        pipeline.eval(INCR_SCRIPT, 1, versioned_key, delta)
+
+        def callback(value):
+            if value is None:
+                raise ValueError("Key '%s' not found" % versioned_key)
+            return value
+
+        return self.queue(pipeline, callback)
+
+    def decr(self, key, delta=1, version=None):
+        return self.incr(key, -delta, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.cache.get_timeout(timeout)
+        pipeline, key = self.route(key, version=version, write=True)
+        if timeout is None:
+            pipeline.persist(key)
+        else:
+            pipeline.expire(key, timeout)
+        return self.queue(pipeline, bool)
+
+    def has_key(self, key, version=None):
+        pipeline, key = self.route(key, version=version)
+        pipeline.exists(key)
+        return self.queue(pipeline, bool)
+
+    #####################
+    # Extra api methods #
+    #####################
+
+    def ttl(self, key, version=None):
+        pipeline, key = self.route(key, version=version)
+        pipeline.ttl(key)
+        return self.queue(pipeline, self.cache.parse_ttl)
+
+    def persist(self, key, version=None):
+        pipeline, key = self.route(key, version=version, write=True)
+        pipeline.persist(key)
+        return self.queue(pipeline)
+
+    def _shard(self, keys, version=None, write=False):
+        """
+        Groups ``(key, versioned_key)`` pairs by the pipeline of their node.
+        """
+        pipelines = defaultdict(list)
+        for key in keys:
+            pipeline, versioned_key = self.route(key, version=version, write=write)
+            pipelines[pipeline].append((key, versioned_key))
+        return pipelines
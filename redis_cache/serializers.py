@@ -3,7 +3,13 @@ try:
 except ImportError:
     import pickle
 
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+import io
 import json
+import struct
+import threading
+from uuid import UUID
 
 try:
     import msgpack
@@ -15,35 +21,149 @@ try:
 except ImportError:
     pass
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import orjson
+except ImportError:
+    pass
+
+from django.apps import apps
+from django.db import router
+from django.db.models import Model
+from django.db.models.base import ModelState
+from django.db.models.query import ModelIterable, QuerySet
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.duration import duration_iso_string
 from django.utils.encoding import force_bytes, force_str
+from django.utils.functional import Promise
+
+from redis_cache.utils import import_class
+
+
+class SerializationError(TypeError):
+    """
+    Raised by serializers for values they cannot store.  The cache stores
+    these values with the serializer's fallback instead.
+    """
 
 
 class BaseSerializer(object):
 
+    # Id stored in the frame header of serialized values.  Serializers without
+    # an id write unframed values.  Framed values are passed to ``deserialize``
+    # as any bytes-like object, including memoryviews.
+    serializer_id = None
+
+    # Serializer storing the values this serializer does not accept or raises
+    # ``SerializationError`` for.
+    fallback = None
+
     def __init__(self, **kwargs):
         super(BaseSerializer, self).__init__(**kwargs)
 
+    def accepts(self, value):
+        return True
+
     def serialize(self, value):
         raise NotImplementedError
 
+    def serialize_framed(self, value, header):
+        """
+        Returns ``value`` serialized and preceded by the frame ``header``.
+        Serializers producing large values can override it to write the
+        header along with the value rather than copying the value after it.
+        """
+        return header + self.serialize(value)
+
     def deserialize(self, value):
         raise NotImplementedError
 
+    def deserialize_many(self, values):
+        return [self.deserialize(value) for value in values]
+
+
+class PickleSerializer(BaseSerializer):
+    """
+    Pickle serializer.
+
+    With ``out_of_band_buffers`` and pickle protocol 5, the out-of-band
+    buffers of objects such as NumPy arrays are stored after the pickle stream
+    instead of being copied into it, and are passed back to ``pickle.loads``
+    as views of the stored value.  Objects rebuilt from these views without
+    copying, like NumPy arrays, are read-only.
+    """
 
-class PickleSerializer(object):
+    serializer_id = 1
 
-    def __init__(self, pickle_version=-1):
+    # Starts values holding out-of-band buffers; no pickle stream starts with
+    # a null byte.
+    out_of_band_marker = b'\x00'
+
+    def __init__(self, pickle_version=-1, out_of_band_buffers=False):
         self.pickle_version = pickle_version
+        protocol = pickle.HIGHEST_PROTOCOL if pickle_version < 0 else pickle_version
+        self.out_of_band_buffers = out_of_band_buffers and protocol >= 5
+        super(PickleSerializer, self).__init__()
 
     def serialize(self, value):
-        return pickle.dumps(value, self.pickle_version)
+        if not self.out_of_band_buffers:
+            return pickle.dumps(value, self.pickle_version)
+        buffers = []
+        data = pickle.dumps(value, self.pickle_version, buffer_callback=buffers.append)
+        if not buffers:
+            return data
+        return self.pack_buffers(data, [buffer.raw() for buffer in buffers])
+
+    def serialize_framed(self, value, header):
+        if not self.out_of_band_buffers:
+            return super(PickleSerializer, self).serialize_framed(value, header)
+        buffers = []
+        data = pickle.dumps(value, self.pickle_version, buffer_callback=buffers.append)
+        if not buffers:
+            return header + data
+        return self.pack_buffers(data, [buffer.raw() for buffer in buffers], prefix=header)
 
     def deserialize(self, value):
-        return pickle.loads(force_bytes(value))
+        if value[:1] == self.out_of_band_marker:
+            data, buffers = self.unpack_buffers(value)
+            return pickle.loads(data, buffers=buffers)
+        return pickle.loads(value)
+
+    def pack_buffers(self, data, buffers, prefix=b''):
+        """
+        Returns the pickle stream ``data`` followed by ``buffers``, preceded by
+        ``prefix``, the marker, the number of buffers and the size of every
+        part.  The parts are copied once, by a single join.
+        """
+        sizes = [len(data)] + [buffer.nbytes for buffer in buffers]
+        header = struct.pack(
+            '<cI%dQ' % len(sizes), self.out_of_band_marker, len(buffers), *sizes
+        )
+        return b''.join([prefix, header, data] + buffers)
+
+    def unpack_buffers(self, value):
+        """
+        Returns views of the pickle stream and buffers packed in ``value``.
+        """
+        value = memoryview(value)
+        count, = struct.unpack_from('<I', value, 1)
+        sizes = struct.unpack_from('<%dQ' % (count + 1), value, 5)
+        offset = 5 + 8 * (count + 1)
+        parts = []
+        for size in sizes:
+            parts.append(value[offset:offset + size])
+            offset += size
+        return parts[0], parts[1:]
 
 
 class JSONSerializer(BaseSerializer):
 
+    serializer_id = 2
+
     def __init__(self, **kwargs):
         super(JSONSerializer, self).__init__(**kwargs)
 
@@ -51,25 +171,127 @@ class JSONSerializer(BaseSerializer):
         return force_bytes(json.dumps(value))
 
     def deserialize(self, value):
-        return json.loads(force_str(value))
+        return json.loads(force_str(force_bytes(value)))
 
 
 class MSGPackSerializer(BaseSerializer):
+    """
+    msgpack serializer.
+
+    Strings and bytes are stored as distinct types.  Datetimes, dates, times,
+    decimals, UUIDs and sets are stored as ext types and read back as the same
+    type; subclasses can support more types by extending ``ext_encoders`` and
+    ``ext_decoders``.  Packers are reused, one per thread.
+    """
+
+    serializer_id = 3
+
+    EXT_DATETIME = 1
+    EXT_DATE = 2
+    EXT_TIME = 3
+    EXT_DECIMAL = 4
+    EXT_UUID = 5
+    EXT_SET = 6
+    EXT_FROZENSET = 7
+
+    def __init__(self, **kwargs):
+        self.ext_encoders = {
+            datetime: (self.EXT_DATETIME, self.pack_isoformat),
+            date: (self.EXT_DATE, self.pack_isoformat),
+            time: (self.EXT_TIME, self.pack_time),
+            Decimal: (self.EXT_DECIMAL, lambda value: str(value).encode()),
+            UUID: (self.EXT_UUID, lambda value: value.bytes),
+            set: (self.EXT_SET, self.pack_items),
+            frozenset: (self.EXT_FROZENSET, self.pack_items),
+        }
+        self.ext_decoders = {
+            self.EXT_DATETIME: lambda data: parse_datetime(data.decode()),
+            self.EXT_DATE: lambda data: parse_date(data.decode()),
+            self.EXT_TIME: self.unpack_time,
+            self.EXT_DECIMAL: lambda data: Decimal(data.decode()),
+            self.EXT_UUID: lambda data: UUID(bytes=data),
+            self.EXT_SET: lambda data: set(self.deserialize(data)),
+            self.EXT_FROZENSET: lambda data: frozenset(self.deserialize(data)),
+        }
+        self._local = threading.local()
+        super(MSGPackSerializer, self).__init__(**kwargs)
+
+    def pack_isoformat(self, value):
+        return value.isoformat().encode()
+
+    def pack_time(self, value):
+        if value.tzinfo is not None and value.utcoffset() is None:
+            # Time zones with daylight saving time have no offset without a
+            # date.
+            raise SerializationError("Cannot serialize %r without its UTC offset" % value)
+        return self.pack_isoformat(value)
+
+    def unpack_time(self, data):
+        # parse_time() drops the UTC offset of aware times.
+        return parse_datetime('1970-01-01T' + data.decode()).timetz()
+
+    def pack_items(self, value):
+        # The packer of the thread is busy with the enclosing value.
+        return msgpack.packb(list(value), use_bin_type=True, default=self.default)
+
+    def default(self, value):
+        for value_type in type(value).__mro__:
+            ext = self.ext_encoders.get(value_type)
+            if ext is not None:
+                code, encode = ext
+                return msgpack.ExtType(code, encode(value))
+        raise TypeError("Cannot serialize %r" % type(value))
+
+    def ext_hook(self, code, data):
+        decode = self.ext_decoders.get(code)
+        if decode is None:
+            return msgpack.ExtType(code, data)
+        return decode(data)
+
+    def get_packer(self):
+        packer = getattr(self._local, 'packer', None)
+        if packer is None:
+            packer = self._local.packer = msgpack.Packer(
+                use_bin_type=True, default=self.default
+            )
+        return packer
+
+    def get_unpacker(self, max_buffer_size=0):
+        return msgpack.Unpacker(
+            raw=False, ext_hook=self.ext_hook, strict_map_key=False,
+            max_buffer_size=max_buffer_size,
+        )
 
     def serialize(self, value):
-        return msgpack.dumps(value)
+        return self.get_packer().pack(value)
 
     def deserialize(self, value):
-        return msgpack.loads(value, encoding='utf-8')
+        return msgpack.unpackb(
+            value, raw=False, ext_hook=self.ext_hook, strict_map_key=False,
+        )
+
+    def deserialize_many(self, values):
+        if not values:
+            return []
+        # The unpacker holds one value at a time; its default limit of
+        # 100 MiB would reject values that ``deserialize`` reads.
+        unpacker = self.get_unpacker(max(len(value) for value in values))
+        results = []
+        for value in values:
+            unpacker.feed(value)
+            results.append(unpacker.unpack())
+        return results
 
 
 class YAMLSerializer(BaseSerializer):
 
+    serializer_id = 4
+
     def serialize(self, value):
         return yaml.dump(value, encoding='utf-8', Dumper=yaml.Dumper)
 
     def deserialize(self, value):
-        return yaml.load(value, Loader=yaml.FullLoader)
+        return yaml.load(force_bytes(value), Loader=yaml.FullLoader)
 
 
 class DummySerializer(BaseSerializer):
@@ -82,3 +304,256 @@ class DummySerializer(BaseSerializer):
 
     def deserialize(self, value):
         return value
+
+
+class NdarraySerializer(BaseSerializer):
+    """
+    Stores NumPy arrays as a header holding their dtype, order and shape,
+    followed by their raw buffer.
+
+    Arrays are decoded with ``numpy.frombuffer`` on the value read from
+    redis, without copying, so they are read-only unless ``writeable`` is
+    set.  Other values, including arrays of objects or structured dtypes and
+    ndarray subclasses, are stored by the ``fallback`` serializer.
+    """
+
+    serializer_id = 5
+
+    def __init__(self, fallback='redis_cache.serializers.PickleSerializer',
+                 fallback_kwargs=None, writeable=False):
+        self.fallback = import_class(fallback)(**(fallback_kwargs or {}))
+        self.writeable = writeable
+        super(NdarraySerializer, self).__init__()
+
+    def accepts(self, value):
+        return (
+            numpy is not None
+            # Subclasses, e.g. masked arrays, carry state the buffer lacks.
+            and type(value) is numpy.ndarray
+            and not value.dtype.hasobject
+            and value.dtype.fields is None
+        )
+
+    def serialize(self, value):
+        if not self.accepts(value):
+            return self.fallback.serialize(value)
+        order = b'F' if value.flags.f_contiguous and not value.flags.c_contiguous else b'C'
+        dtype = value.dtype.str.encode()
+        header = struct.pack(
+            '<B%dscB%dQ' % (len(dtype), value.ndim),
+            len(dtype), dtype, order, value.ndim, *value.shape
+        )
+        data = value.ravel(order=order.decode()).view(numpy.uint8)
+        return b''.join((header, data))
+
+    def deserialize(self, value):
+        dtype_size = value[0]
+        dtype = bytes(value[1:1 + dtype_size]).decode()
+        order, ndim = struct.unpack_from('<cB', value, 1 + dtype_size)
+        offset = 3 + dtype_size
+        shape = struct.unpack_from('<%dQ' % ndim, value, offset)
+        offset += 8 * ndim
+        array = numpy.frombuffer(value, dtype=dtype, offset=offset)
+        array = array.reshape(shape, order=order.decode())
+        if self.writeable:
+            array = array.copy(order='K')
+        return array
+
+
+class OrjsonSerializer(BaseSerializer):
+    """
+    JSON serializer backed by orjson, which encodes straight to bytes and
+    decodes bytes or memoryviews without copying them.
+
+    Types orjson cannot encode are converted by ``encoders``, a mapping of
+    types, or their dotted paths, to callables, or their dotted paths,
+    returning a value orjson can encode.  By default, decimals, durations and
+    lazy strings are encoded like ``DjangoJSONEncoder`` does.  Like other JSON
+    values, they are read back as strings.  Values that cannot be encoded are
+    stored by the ``fallback`` serializer.
+    """
+
+    serializer_id = 6
+
+    default_encoders = {
+        Decimal: str,
+        timedelta: duration_iso_string,
+        Promise: str,
+    }
+
+    def __init__(self, encoders=None, option=0,
+                 fallback='redis_cache.serializers.PickleSerializer', fallback_kwargs=None):
+        self.encoders = dict(self.default_encoders)
+        for value_type, encoder in (encoders or {}).items():
+            if isinstance(value_type, str):
+                value_type = import_class(value_type)
+            if isinstance(encoder, str):
+                encoder = import_class(encoder)
+            self.encoders[value_type] = encoder
+        self.option = option
+        if fallback is not None:
+            self.fallback = import_class(fallback)(**(fallback_kwargs or {}))
+        super(OrjsonSerializer, self).__init__()
+
+    def default(self, value):
+        for value_type in type(value).__mro__:
+            encoder = self.encoders.get(value_type)
+            if encoder is not None:
+                return encoder(value)
+        raise TypeError
+
+    def serialize(self, value):
+        try:
+            return orjson.dumps(value, default=self.default, option=self.option)
+        except orjson.JSONEncodeError as e:
+            raise SerializationError(str(e))
+
+    def deserialize(self, value):
+        return orjson.loads(value)
+
+
+class ModelSerializer(PickleSerializer):
+    """
+    Pickle serializer storing Django model instances compactly.
+
+    Saved instances are stored as their model label, the attribute names of
+    their loaded concrete fields, a tuple of field values and their database.
+    Querysets are stored as one label and one set of attribute names followed
+    by a tuple per instance.  Only field values are stored: cached relations,
+    prefetched objects and other attributes are not.
+
+    Instances are rebuilt with ``Model.from_db``, like querysets build them.
+    With ``bypass_init``, instances of models that do not override
+    ``from_db`` are rebuilt the way unpickling rebuilds them instead, without
+    calling ``Model.__init__`` or sending its signals.
+    """
+
+    serializer_id = 7
+
+    INSTANCES = 0
+    QUERYSET = 1
+    LIST = 2
+
+    def __init__(self, pickle_version=-1, bypass_init=False):
+        self.bypass_init = bypass_init
+        # Model label and field attribute names by model class.
+        self._schemas = {}
+        # Model class, field names and value indexes by stored model label and
+        # attribute names.
+        self._models = {}
+        super(ModelSerializer, self).__init__(
+            pickle_version=pickle_version, out_of_band_buffers=False
+        )
+
+    def get_schema(self, model):
+        schema = self._schemas.get(model)
+        if schema is None:
+            schema = self._schemas[model] = (
+                model._meta.label,
+                tuple(field.attname for field in model._meta.concrete_fields),
+            )
+        return schema
+
+    def get_model(self, label, attnames):
+        """
+        Returns the model class stored as ``label``, and the names and
+        indexes of the stored fields it still has, or ``None`` for the
+        indexes if its fields did not change.
+        """
+        model = self._models.get((label, attnames))
+        if model is None:
+            model_class = apps.get_model(label)
+            current = self.get_schema(model_class)[1]
+            if current == attnames:
+                field_names, indexes = attnames, None
+            else:
+                field_names = tuple(name for name in current if name in attnames)
+                indexes = [attnames.index(name) for name in field_names]
+            model = self._models[(label, attnames)] = (model_class, field_names, indexes)
+        return model
+
+    def dump_instances(self, model, instances):
+        label, attnames = self.get_schema(model)
+        if instances:
+            loaded = instances[0].__dict__
+            if not all(name in loaded for name in attnames):
+                # Deferred fields are not stored.
+                attnames = tuple(name for name in attnames if name in loaded)
+        rows = [
+            tuple([instance.__dict__[name] for name in attnames])
+            for instance in instances
+        ]
+        # One database for all the instances, or one per instance.
+        dbs = [instance._state.db for instance in instances]
+        db = dbs[0] if len(set(dbs)) == 1 else tuple(dbs)
+        return label, attnames, rows, db
+
+    def load_instances(self, label, attnames, rows, db=None):
+        model, field_names, indexes = self.get_model(label, attnames)
+        if indexes is not None:
+            rows = [[row[index] for index in indexes] for row in rows]
+        if db is None:
+            # Stored before the database was.
+            db = router.db_for_read(model)
+        dbs = db if isinstance(db, tuple) else [db] * len(rows)
+        if not self.bypass_init or model.from_db.__func__ is not Model.from_db.__func__:
+            return [model.from_db(db, field_names, row) for db, row in zip(dbs, rows)]
+        instances = []
+        for db, row in zip(dbs, rows):
+            instance = model.__new__(model)
+            instance.__dict__.update(zip(field_names, row))
+            state = instance._state = ModelState()
+            state.adding = False
+            state.db = db
+            instances.append(instance)
+        return instances
+
+    def persistent_id(self, obj):
+        if isinstance(obj, QuerySet):
+            instances = list(obj)
+            if obj._iterable_class is ModelIterable:
+                try:
+                    return (self.QUERYSET,) + self.dump_instances(obj.model, instances)
+                except KeyError:
+                    # Instances with different deferred fields are stored
+                    # one by one.
+                    pass
+            return self.LIST, instances
+        if isinstance(obj, Model) and not obj._state.adding:
+            return (self.INSTANCES,) + self.dump_instances(type(obj), [obj])
+        return None
+
+    def persistent_load(self, pid):
+        kind = pid[0]
+        if kind == self.LIST:
+            return pid[1]
+        instances = self.load_instances(*pid[1:])
+        return instances if kind == self.QUERYSET else instances[0]
+
+    def serialize(self, value):
+        buffer = io.BytesIO()
+        pickler = pickle.Pickler(buffer, self.pickle_version)
+        pickler.persistent_id = self.persistent_id
+        pickler.dump(value)
+        return buffer.getvalue()
+
+    def deserialize(self, value):
+        unpickler = pickle.Unpickler(io.BytesIO(value))
+        unpickler.persistent_load = self.persistent_load
+        return unpickler.load()
+
+
+# Serializers used to read framed values, by frame id.  Custom serializers
+# with a ``serializer_id`` between 8 and 15 can be added to this registry.
+SERIALIZERS = {
+    serializer_class.serializer_id: serializer_class
+    for serializer_class in (
+        PickleSerializer,
+        JSONSerializer,
+        MSGPackSerializer,
+        YAMLSerializer,
+        NdarraySerializer,
+        OrjsonSerializer,
+        ModelSerializer,
+    )
+}
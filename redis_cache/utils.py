@@ -1,4 +1,6 @@
 import importlib
+from itertools import islice
+import time
 import warnings
 
 from django.core.exceptions import ImproperlyConfigured
@@ -21,6 +23,50 @@ def get_servers(location):
     return servers
 
 
+def chunks(items, size):
+    """Yields lists of at most ``size`` items.  If ``size`` is None, all of
+    the items are yielded as a single list.
+    """
+    if not size:
+        items = list(items)
+        if items:
+            yield items
+        return
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class RateLimiter(object):
+    """Sleeps just long enough to keep the number of items processed under
+    ``rate`` per second.  A ``rate`` of None disables the limit.
+    """
+
+    def __init__(self, rate=None):
+        self.rate = rate
+        self.start = time.time()
+        self.total = 0
+
+    def __call__(self, count):
+        self.total += count
+        if not self.rate:
+            return
+        delay = self.total / float(self.rate) - (time.time() - self.start)
+        if delay > 0:
+            time.sleep(delay)
+
+
+def is_wrong_type(error):
+    """
+    Returns whether a redis error was raised by reading a chunked value, which
+    is stored as a hash, with a string command.
+    """
+    return str(error).startswith('WRONGTYPE')
+
+
 def import_class(path):
     module_name, class_name = path.rsplit('.', 1)
     try:
@@ -7,7 +7,12 @@ setup(
     author_email="sebleier@gmail.com",
     version="3.0.1",
     license="BSD",
-    packages=["redis_cache", "redis_cache.backends"],
+    packages=[
+        "redis_cache",
+        "redis_cache.backends",
+        "redis_cache.management",
+        "redis_cache.management.commands",
+    ],
     description="Redis Cache Backend for Django",
     install_requires=['redis<4.0'],
     classifiers=[
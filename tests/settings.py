@@ -8,6 +8,7 @@ DATABASES = {
 
 INSTALLED_APPS = [
     'django_nose',
+    'redis_cache',
     'tests.testapp',
 ]
 
@@ -355,6 +355,27 @@ class BaseRedisTestCase(SetupMixin):
         self.assertIsNone(self.cache.get("key1"))
         self.assertIsNone(self.cache.get("key2"))
 
+    def test_set_many_timeouts(self):
+        self.cache.set_many(
+            {'a': 'a', 'b': 'b', 'c': 'c', 'd': 'd', 'e': 1},
+            timeout=10,
+            timeouts={'b': 20, 'c': None, 'd': -1, 'e': None},
+        )
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c', 'd', 'e']),
+            {'a': 'a', 'b': 'b', 'c': 'c', 'e': 1},
+        )
+        self.assertEqual(self.cache.ttl('a'), 10)
+        self.assertEqual(self.cache.ttl('b'), 20)
+        self.assertIsNone(self.cache.ttl('c'))
+        self.assertIsNone(self.cache.ttl('e'))
+        self.assertEqual(self.cache.incr('e'), 2)
+
+    def test_set_many_without_expiry(self):
+        self.cache.set_many({'a': 'a', 'b': 1}, timeout=None)
+        self.assertEqual(self.cache.get_many(['a', 'b']), {'a': 'a', 'b': 1})
+        self.assertEqual(self.cache.ttl_many(['a', 'b']), {'a': None, 'b': None})
+
     def test_set_many_version(self):
         self.cache.set_many({"key1": "spam", "key2": "eggs"}, version=2)
         self.assertEqual(self.cache.get("key1", version=2), "spam")
@@ -454,6 +475,14 @@ class BaseRedisTestCase(SetupMixin):
         items = self.cache.get_many(data.keys())
         self.assertEqual(len(items), 3)
 
+    def test_delete_pattern_in_pages(self):
+        self.cache.set_many({'a{0}'.format(i): i for i in range(100)})
+        self.cache.set('b', 'b')
+        deleted = self.cache.delete_pattern('a*', count=10, rate_limit=10000)
+        self.assertEqual(deleted, 100)
+        self.assertEqual(list(self.cache.iter_keys('*')), ['b'])
+        self.assertEqual(self.cache.delete_pattern('a*'), 0)
+
     def test_clearing_using_version(self):
         self.cache.set('a', 'a', version=1)
         self.cache.set('b', 'b', version=1)
@@ -492,6 +521,91 @@ class BaseRedisTestCase(SetupMixin):
         self.assertEqual(self.cache.get('b'), 'b')
         self.assertGreater(self.cache.ttl('a'), 1)
 
+    def test_reinsert_keys_preserves_ttl(self):
+        self.cache.set('a', 'a', 100)
+        self.cache.set('b', 'b', None)
+        self.cache.set('c', 1)
+        self.assertEqual(self.cache.reinsert_keys(), 3)
+        self.assertAlmostEqual(self.cache.ttl('a'), 100, delta=1)
+        self.assertIsNone(self.cache.ttl('b'))
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'a': 'a', 'b': 'b', 'c': 1})
+
+    def test_reinsert_keys_progress(self):
+        self.cache.set_many({'a{0}'.format(i): i for i in range(100)})
+        cursors = {}
+
+        def callback(identifier, cursor):
+            cursors[identifier] = cursor
+
+        self.assertEqual(self.cache.reinsert_keys(count=10, callback=callback), 100)
+        self.assertEqual(set(cursors), set(self.cache.clients))
+        self.assertEqual(set(cursors.values()), {None})
+        # Nodes that are done are skipped when resuming.
+        self.assertEqual(self.cache.reinsert_keys(cursors=cursors), 0)
+
+    def test_reinsert_keys_progress_after_writes(self):
+        self.cache.set_many({'a{0}'.format(i): i for i in range(100)})
+        events = {identifier: [] for identifier in self.cache.clients}
+
+        def spy(pipeline, events):
+            def wrapper(*args, **kwargs):
+                p = pipeline(*args, **kwargs)
+                execute = p.execute
+
+                def send(*args, **kwargs):
+                    writes = sum(1 for command in p.command_stack if command[0][0] == 'EVAL')
+                    events.append(('execute', writes))
+                    return execute(*args, **kwargs)
+                p.execute = send
+                return p
+            return wrapper
+
+        def callback(identifier, cursor):
+            if cursor is not None:
+                events[identifier].append(('callback', cursor))
+
+        clients = self.cache.clients
+        for identifier, client in clients.items():
+            client.pipeline = spy(client.pipeline, events[identifier])
+        try:
+            self.assertEqual(self.cache.reinsert_keys(count=10, callback=callback), 100)
+        finally:
+            for client in clients.values():
+                del client.pipeline
+        # Every page is written before its cursor is reported.
+        for node_events in events.values():
+            for previous, event in zip(node_events, node_events[1:]):
+                if event[0] == 'callback':
+                    self.assertEqual(previous[0], 'execute')
+                    self.assertGreater(previous[1], 0)
+
+    def test_reinsert_keys_keeps_concurrent_writes(self):
+        self.cache.set('a', 'a')
+        self.cache.set('b', 'b')
+        key = self.cache.make_key('a')
+        client = self.cache.get_client(key, write=True)
+        get_value = self.cache.get_value
+
+        def write_while_reinserting(original):
+            # 'a' is written again between the GET and the rewrite.
+            value = get_value(original)
+            if value == 'a':
+                client.set(key, self.cache.prep_value('new'))
+            return value
+
+        self.cache.get_value = write_while_reinserting
+        self.cache.reinsert_keys()
+        del self.cache.get_value
+        self.assertEqual(self.cache.get_many(['a', 'b']), {'a': 'new', 'b': 'b'})
+
+    def test_reinsert_keys_skips_foreign_values(self):
+        self.cache.set('a', 'a')
+        key = self.cache.make_key('lock')
+        self.cache.get_client(key, write=True).set(key, b'not a cache value')
+        with self.assertLogs('redis_cache.backends.base', 'WARNING') as logs:
+            self.assertEqual(self.cache.reinsert_keys(), 1)
+        self.assertIn('Skipped 1 keys', logs.output[0])
+
     def test_get_or_set_with_callable(self):
 
         def expensive_function():
@@ -675,6 +789,214 @@ class BaseRedisTestCase(SetupMixin):
         ttl = self.cache.ttl('a')
         self.assertAlmostEqual(ttl, 20)
 
+    def test_pipeline(self):
+        self.cache.set('a', 'a')
+        self.cache.set('n', 1)
+        with self.cache.pipeline() as p:
+            a = p.get('a')
+            missing = p.get('missing', 'default')
+            n = p.incr('n', 5)
+            b = p.set('b', {'b': 1}, timeout=10)
+            has_b = p.has_key('b')
+        self.assertEqual(a.result(), 'a')
+        self.assertEqual(missing.result(), 'default')
+        self.assertEqual(n.result(), 6)
+        self.assertTrue(b.result())
+        self.assertTrue(has_b.result())
+        self.assertEqual(self.cache.get('b'), {'b': 1})
+        self.assertAlmostEqual(self.cache.ttl('b'), 10)
+
+    def test_pipeline_many(self):
+        with self.cache.pipeline() as p:
+            p.set_many({'a': 'a', 'b': 'b', 'c': 'c'}, version=2)
+            values = p.get_many(['a', 'b', 'c', 'd'], version=2)
+            deleted = p.delete_many(['a', 'b'], version=2)
+        self.assertEqual(values.result(), {'a': 'a', 'b': 'b', 'c': 'c'})
+        self.assertEqual(deleted.result(), 2)
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c'], version=2), {'c': 'c'})
+
+    def test_pipeline_incr_missing_key(self):
+        with self.cache.pipeline() as p:
+            n = p.incr('does_not_exist')
+        with self.assertRaises(ValueError):
+            n.result()
+        self.assertFalse(self.cache.has_key('does_not_exist'))
+
+    def test_pipeline_ttl(self):
+        self.cache.set('a', 'a', timeout=None)
+        self.cache.set('b', 'b', timeout=None)
+        with self.cache.pipeline() as p:
+            p.touch('a', 10)
+            ttl_a = p.ttl('a')
+            ttl_b = p.ttl('b')
+            ttl_c = p.ttl('c')
+        self.assertAlmostEqual(ttl_a.result(), 10)
+        self.assertIsNone(ttl_b.result())
+        self.assertEqual(ttl_c.result(), 0)
+
+    def test_pipeline_not_executed_on_error(self):
+        with self.assertRaises(KeyError):
+            with self.cache.pipeline() as p:
+                a = p.set('a', 'a')
+                raise KeyError
+        self.assertFalse(a.done())
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_set_many_batches_not_transactional(self):
+        transactions = []
+
+        def spy(pipeline):
+            def wrapper(transaction=True, shard_hint=None):
+                transactions.append(transaction)
+                return pipeline(transaction, shard_hint)
+            return wrapper
+
+        clients = list(self.cache.clients.values())
+        for client in clients:
+            client.pipeline = spy(client.pipeline)
+        try:
+            data = {str(i): i for i in range(25)}
+            for concurrent_batches in (False, True):
+                self.cache.max_batch_size = 10
+                self.cache.concurrent_batches = concurrent_batches
+                self.cache.set_many(data)
+                self.assertEqual(self.cache.get_many(list(data)), data)
+        finally:
+            for client in clients:
+                del client.pipeline
+        self.assertTrue(transactions)
+        self.assertNotIn(True, transactions)
+
+    def test_set_many_encodes_per_batch(self):
+        events = []
+        prep_value = self.cache.prep_value
+
+        def encode(value):
+            events.append('encode')
+            return prep_value(value)
+
+        def spy(pipeline):
+            def wrapper(*args, **kwargs):
+                p = pipeline(*args, **kwargs)
+                execute = p.execute
+
+                def send(*args, **kwargs):
+                    events.append('execute')
+                    return execute(*args, **kwargs)
+                p.execute = send
+                return p
+            return wrapper
+
+        # The codec pool encodes every value up front.
+        self.cache.codec_pool = None
+        clients = list(self.cache.clients.values())
+        for client in clients:
+            client.pipeline = spy(client.pipeline)
+        self.cache.prep_value = encode
+        try:
+            self.cache.max_batch_size = 10
+            self.cache.set_many({str(i): i for i in range(25)})
+        finally:
+            del self.cache.prep_value
+            for client in clients:
+                del client.pipeline
+        # No batch is encoded before the previous one was sent.
+        self.assertLessEqual(events.count('encode'), 25)
+        encoded = 0
+        for event in events:
+            if event == 'encode':
+                encoded += 1
+                self.assertLessEqual(encoded, 10)
+            else:
+                encoded = 0
+
+    def test_batched_bulk_operations(self):
+        data = {str(i): i for i in range(25)}
+        for concurrent_batches in (False, True):
+            self.cache.max_batch_size = 10
+            self.cache.concurrent_batches = concurrent_batches
+            self.cache.set_many(data)
+            self.assertEqual(self.cache.get_many(list(data) + ['missing']), data)
+            self.cache.delete_many(list(data)[:15])
+            self.assertEqual(len(self.cache.get_many(list(data))), 10)
+
+    def test_iter_keys(self):
+        self.cache.set_many({'a{0}'.format(i): i for i in range(50)})
+        self.cache.set('b', 'b')
+        self.cache.set('a1', 'a1', version=2)
+        keys = list(self.cache.iter_keys('a*', count=10))
+        self.assertEqual(sorted(keys), sorted('a{0}'.format(i) for i in range(50)))
+        self.assertEqual(list(self.cache.iter_keys('a*', version=2)), ['a1'])
+        self.assertEqual(list(self.cache.iter_keys('does_not_exist*')), [])
+
+    def test_iter_keys_key_prefix(self):
+        self.cache.key_prefix = 'myapp:prod'
+        self.cache.set('plain', 'plain')
+        self.cache.set('a:b', 'a:b', version=2)
+        self.assertEqual(list(self.cache.iter_keys('*')), ['plain'])
+        self.assertEqual(list(self.cache.iter_items('*', version=2)), [('a:b', 'a:b')])
+
+    def test_iter_items(self):
+        data = {'a{0}'.format(i): i for i in range(50)}
+        data['a_dict'] = {'a': 1}
+        self.cache.set_many(data)
+        self.cache.set('b', 'b')
+        self.assertEqual(dict(self.cache.iter_items('a*', count=10)), data)
+
+    def test_ttl_many(self):
+        self.cache.set('a', 'a', timeout=10)
+        self.cache.set('b', 'b', timeout=None)
+        self.assertEqual(
+            self.cache.ttl_many(['a', 'b', 'c']),
+            {'a': 10, 'b': None, 'c': 0},
+        )
+
+    def test_touch_many(self):
+        self.cache.set_many({'a': 'a', 'b': 'b'}, timeout=None)
+        self.assertEqual(
+            self.cache.touch_many(['a', 'b', 'c'], 10),
+            {'a': True, 'b': True, 'c': False},
+        )
+        self.assertEqual(self.cache.ttl_many(['a', 'b']), {'a': 10, 'b': 10})
+
+    def test_persist_many(self):
+        self.cache.set_many({'a': 'a', 'b': 'b'}, timeout=10, version=2)
+        self.assertEqual(
+            self.cache.persist_many(['a', 'b'], version=2),
+            {'a': True, 'b': True},
+        )
+        self.assertEqual(
+            self.cache.ttl_many(['a', 'b'], version=2),
+            {'a': None, 'b': None},
+        )
+
+    def test_has_keys(self):
+        self.cache.set_many({'a': 'a', 'b': 'b'})
+        self.assertEqual(
+            self.cache.has_keys(['a', 'b', 'c']),
+            {'a': True, 'b': True, 'c': False},
+        )
+        self.assertEqual(self.cache.has_keys([]), {})
+
+    def test_framed_values(self):
+        self.cache.set('a', {'a': 1})
+        self.cache.set('b', 12)
+        key = self.cache.make_key('a')
+        self.assertIn(
+            self.cache.get_client(key).get(key)[:2],
+            (self.cache.frame_header, self.cache.uncompressed_frame_header),
+        )
+        key = self.cache.make_key('b')
+        self.assertEqual(self.cache.get_client(key).get(key), b'12')
+        self.assertEqual(self.cache.incr('b'), 13)
+
+    def test_unframed_values(self):
+        key = self.cache.make_key('a')
+        client = self.cache.get_client(key, write=True)
+        for value in ({'a': 1}, 'string', 1.5, 12):
+            client.set(key, self.cache.compress(self.cache.serialize(value)))
+            self.assertEqual(self.cache.get('a'), value)
+
 
 class ConfigurationTestCase(SetupMixin, TestCase):
 
@@ -700,6 +1022,109 @@ class ConfigurationTestCase(SetupMixin, TestCase):
         with self.assertRaises(ImproperlyConfigured):
             caches['default']
 
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'redis_cache.RedisCache',
+                'LOCATION': LOCATION,
+                'OPTIONS': {
+                    'DB': 15,
+                    'PASSWORD': 'yadayada',
+                    'MAX_BATCH_SIZE': 'many',
+                },
+            },
+        }
+    )
+    def test_bad_max_batch_size(self):
+        with self.assertRaises(ImproperlyConfigured):
+            caches['default']
+
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'redis_cache.RedisCache',
+                'LOCATION': LOCATION,
+                'OPTIONS': {
+                    'DB': 15,
+                    'PASSWORD': 'yadayada',
+                    'MIN_COMPRESS_SAVINGS': 10,
+                },
+            },
+        }
+    )
+    def test_bad_min_compress_savings(self):
+        with self.assertRaises(ImproperlyConfigured):
+            caches['default']
+
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'redis_cache.RedisCache',
+                'LOCATION': LOCATION,
+                'OPTIONS': {
+                    'DB': 15,
+                    'PASSWORD': 'yadayada',
+                    'CODEC_POOL': 'fiber',
+                },
+            },
+        }
+    )
+    def test_bad_codec_pool(self):
+        with self.assertRaises(ImproperlyConfigured):
+            caches['default']
+
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'redis_cache.RedisCache',
+                'LOCATION': LOCATION,
+                'OPTIONS': {
+                    'DB': 15,
+                    'PASSWORD': 'yadayada',
+                    'MAX_CONNECTIONS': 0,
+                },
+            },
+        }
+    )
+    def test_bad_max_connections(self):
+        with self.assertRaises(ImproperlyConfigured):
+            caches['default']
+
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'redis_cache.RedisCache',
+                'LOCATION': LOCATION,
+                'OPTIONS': {
+                    'DB': 15,
+                    'PASSWORD': 'yadayada',
+                    'MAX_CONNECTIONS': 10,
+                    'CONNECTION_POOL_CLASS': 'redis_cache.connection.ThreadAffineConnectionPool',
+                },
+            },
+        }
+    )
+    def test_max_connections_without_blocking_pool(self):
+        with self.assertRaises(ImproperlyConfigured):
+            caches['default']
+
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'redis_cache.RedisCache',
+                'LOCATION': LOCATION,
+                'OPTIONS': {
+                    'DB': 15,
+                    'PASSWORD': 'yadayada',
+                    'MAX_IDLE_TIME': -1,
+                },
+            },
+        }
+    )
+    def test_bad_max_idle_time(self):
+        with self.assertRaises(ImproperlyConfigured):
+            caches['default']
+
 
 @override_settings(CACHES={
     'default': {
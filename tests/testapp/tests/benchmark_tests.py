@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from io import StringIO
+import json
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from tests.testapp.tests.base_tests import SetupMixin
+
+
+class BenchmarkCodecsTestCase(SetupMixin, TestCase):
+
+    def call(self, *args, **options):
+        stdout = StringIO()
+        call_command(
+            'benchmark_codecs', *args, rounds=1, stdout=stdout,
+            serializer=[
+                'redis_cache.serializers.PickleSerializer',
+                'redis_cache.serializers.JSONSerializer',
+            ],
+            compressor=[
+                'redis_cache.compressors.NoopCompressor',
+                'redis_cache.compressors.ZLibCompressor',
+            ],
+            **options
+        )
+        return stdout.getvalue()
+
+    def test_sampled_values(self):
+        self.cache.set_many({'key%d' % i: {'id': i} for i in range(10)})
+        output = self.call()
+        self.assertIn('10 values', output)
+        self.assertIn('PickleSerializer', output)
+        self.assertIn('ZLibCompressor', output)
+
+    def test_json_output(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as values:
+            json.dump([{'id': i} for i in range(10)], values)
+            values.flush()
+            results = json.loads(self.call(values=values.name, json='-'))
+
+        self.assertEqual(len(results), 4)
+        for result in results:
+            self.assertGreater(result['bytes'], 0)
+            self.assertGreater(result['encode']['throughput'], 0)
+            self.assertLessEqual(result['decode']['p50'], result['decode']['p99'])
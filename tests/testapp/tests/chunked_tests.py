@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+import redis
+
+from tests.testapp.tests.base_tests import BaseRedisTestCase, SetupMixin
+
+
+LOCATION = "127.0.0.1:6381"
+LOCATIONS = [
+    '127.0.0.1:6381',
+    '127.0.0.1:6382',
+    '127.0.0.1:6383',
+]
+
+
+class ChunkedValuesTestCase(object):
+
+    def get_raw_type(self, key):
+        key = self.cache.make_key(key)
+        return self.cache.get_client(key).type(key)
+
+    def test_chunked_bytes(self):
+        value = bytes(range(256)) * 40
+        self.assertTrue(self.cache.set('a', value, timeout=60))
+        self.assertEqual(self.get_raw_type('a'), b'hash')
+        self.assertEqual(self.cache.get('a'), value)
+        self.assertGreater(self.cache.ttl('a'), 0)
+        self.assertTrue(self.cache.has_key('a'))
+
+    def test_chunked_objects(self):
+        value = {'a': 'a' * 5000, 'b': list(range(1000))}
+        self.cache.set('a', value)
+        self.assertEqual(self.get_raw_type('a'), b'hash')
+        self.assertEqual(self.cache.get('a'), value)
+
+    def test_small_values_not_chunked(self):
+        self.cache.set('a', b'a')
+        self.assertEqual(self.get_raw_type('a'), b'string')
+
+    def test_get_many(self):
+        self.cache.set_many({'a': b'a' * 5000, 'b': 'b'}, timeout=None)
+        self.cache.set('c', b'c' * 5000, timeout=60)
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c', 'd']),
+            {'a': b'a' * 5000, 'b': 'b', 'c': b'c' * 5000},
+        )
+
+    def test_add(self):
+        self.assertTrue(self.cache.add('a', b'a' * 5000))
+        self.assertFalse(self.cache.add('a', b'b' * 5000))
+        self.assertEqual(self.cache.get('a'), b'a' * 5000)
+
+    def test_overwrite_and_delete(self):
+        self.cache.set('a', b'a' * 5000)
+        self.cache.set('a', b'b' * 3000)
+        self.assertEqual(self.cache.get('a'), b'b' * 3000)
+        self.cache.set('a', 'small')
+        self.assertEqual(self.cache.get('a'), 'small')
+        self.cache.set('a', b'c' * 5000)
+        self.cache.delete('a')
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_overwrite_deletes_previous_chunks(self):
+        self.cache.set('a', b'a' * 5000, timeout=60)
+        self.cache.set('a', b'b' * 2500, timeout=None)
+        key = self.cache.make_key('a')
+        # The manifest and the three chunks of the new value.
+        self.assertEqual(self.cache.get_client(key).hlen(key), 4)
+        self.assertIsNone(self.cache.ttl('a'))
+        self.assertEqual(self.cache.get('a'), b'b' * 2500)
+
+    def test_chunks_written_separately(self):
+        pipeline_eval = redis.client.Pipeline.eval
+        with mock.patch.object(
+            redis.client.Pipeline, 'eval', autospec=True, side_effect=pipeline_eval,
+        ) as eval_:
+            self.assertTrue(self.cache.set('a', b'a' * 5000))
+        # Six chunks, including the frame header, and the manifest.
+        self.assertEqual(eval_.call_count, 7)
+        self.assertEqual(self.cache.get('a'), b'a' * 5000)
+
+    def test_add_over_small_value(self):
+        self.cache.set('a', 'small')
+        self.assertFalse(self.cache.add('a', b'a' * 5000))
+        self.assertEqual(self.cache.get('a'), 'small')
+
+    def test_missing_chunk(self):
+        self.cache.set('a', b'a' * 5000)
+        key = self.cache.make_key('a')
+        client = self.cache.get_client(key)
+        token = client.hget(key, 'manifest').split(b':')[0]
+        client.hdel(key, b'%s:1' % token)
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.get_many(['a']), {})
+
+    def test_get_stream(self):
+        value = bytes(range(256)) * 40
+        self.cache.set('a', value)
+        stream = self.cache.get_stream('a')
+        chunks = list(stream)
+        self.assertEqual(len(chunks), 11)
+        self.assertEqual(b''.join(chunks), value)
+
+        self.cache.set('b', b'small')
+        self.assertEqual(list(self.cache.get_stream('b')), [b'small'])
+        self.assertIsNone(self.cache.get_stream('c'))
+        self.cache.set('d', {'a': 'a' * 5000})
+        with self.assertRaises(TypeError):
+            self.cache.get_stream('d')
+
+    def test_iter_items_chunked(self):
+        self.cache.set('a', b'a' * 5000)
+        self.assertEqual(dict(self.cache.iter_items('*')), {'a': b'a' * 5000})
+
+    def test_pipeline(self):
+        self.cache.set('a', b'a' * 5000)
+        self.cache.set('b', {'b': 'b' * 5000})
+        self.cache.set('c', 'c')
+        with self.cache.pipeline() as p:
+            a = p.get('a')
+            b = p.get('b')
+            missing = p.get('missing', 'default')
+            values = p.get_many(['a', 'b', 'c', 'missing'])
+        self.assertEqual(a.result(), b'a' * 5000)
+        self.assertEqual(b.result(), {'b': 'b' * 5000})
+        self.assertEqual(missing.result(), 'default')
+        self.assertEqual(
+            values.result(),
+            {'a': b'a' * 5000, 'b': {'b': 'b' * 5000}, 'c': 'c'},
+        )
+
+    def test_pipeline_set(self):
+        with self.cache.pipeline() as p:
+            a = p.set('a', b'a' * 5000)
+            b = p.set('b', 'b')
+            c = p.add('a', b'c' * 5000)
+            d = p.get('b')
+        self.assertIs(a.result(), True)
+        self.assertIs(b.result(), True)
+        self.assertIs(c.result(), False)
+        self.assertEqual(d.result(), 'b')
+        self.assertEqual(self.cache.get('a'), b'a' * 5000)
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'redis_cache.RedisCache',
+            'LOCATION': LOCATION,
+            'OPTIONS': {
+                'DB': 15,
+                'PASSWORD': 'yadayada',
+                'PARSER_CLASS': 'redis.connection.HiredisParser',
+                'PICKLE_VERSION': -1,
+                'CHUNK_SIZE': 1000,
+                'CONNECTION_POOL_CLASS': 'redis.ConnectionPool',
+                'CONNECTION_POOL_CLASS_KWARGS': {
+                    'max_connections': 2,
+                },
+            },
+        },
+    }
+)
+class SingleChunkedValuesTestCase(ChunkedValuesTestCase, BaseRedisTestCase, TestCase):
+    pass
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'redis_cache.ShardedRedisCache',
+            'LOCATION': LOCATIONS,
+            'OPTIONS': {
+                'DB': 15,
+                'PASSWORD': 'yadayada',
+                'PARSER_CLASS': 'redis.connection.HiredisParser',
+                'PICKLE_VERSION': -1,
+                'CHUNK_SIZE': 1000,
+                'CONNECTION_POOL_CLASS': 'redis.ConnectionPool',
+                'CONNECTION_POOL_CLASS_KWARGS': {
+                    'max_connections': 2,
+                },
+            },
+        },
+    }
+)
+class MultipleChunkedValuesTestCase(ChunkedValuesTestCase, BaseRedisTestCase, TestCase):
+    pass
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'redis_cache.RedisCache',
+            'LOCATION': LOCATION,
+            'OPTIONS': {
+                'DB': 15,
+                'PASSWORD': 'yadayada',
+                'PARSER_CLASS': 'redis.connection.HiredisParser',
+                'SERIALIZER_CLASS': 'redis_cache.serializers.JSONSerializer',
+                'COMPRESSOR_CLASS': 'redis_cache.compressors.ZLibCompressor',
+                'CHUNK_SIZE': 1000,
+                'REWRITE_ON_READ': True,
+            },
+        },
+        'pickle': {
+            'BACKEND': 'redis_cache.RedisCache',
+            'LOCATION': LOCATION,
+            'OPTIONS': {
+                'DB': 15,
+                'PASSWORD': 'yadayada',
+                'PARSER_CLASS': 'redis.connection.HiredisParser',
+                'CHUNK_SIZE': 1000,
+            },
+        },
+    }
+)
+class RewriteChunkedValuesTestCase(SetupMixin, TestCase):
+
+    def get_raw_type(self, key):
+        key = self.cache.make_key(key)
+        return self.cache.get_client(key).type(key)
+
+    def test_rewrite_on_read(self):
+        pickle_cache = self.get_cache('pickle')
+        pickle_cache.set('a', {'a': 'a' * 5000})
+        pickle_cache.set('b', 'b')
+        self.cache.set('c', b'c' * 5000)
+        self.assertEqual(self.get_raw_type('a'), b'hash')
+        self.assertEqual(self.get_raw_type('c'), b'hash')
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']),
+            {'a': {'a': 'a' * 5000}, 'b': 'b', 'c': b'c' * 5000},
+        )
+        self.assertEqual(self.cache.get('a'), {'a': 'a' * 5000})
+        self.assertEqual(self.cache.get('c'), b'c' * 5000)
+        self.assertEqual(self.get_raw_type('a'), b'hash')
+        self.assertFalse(self.cache.is_stale(self.cache.prep_value(b'c' * 5000)))
+
+    def test_reinsert_keys_chunks_grown_values(self):
+        self.cache.set('a', 'a' * 5000, timeout=100)
+        self.assertEqual(self.get_raw_type('a'), b'string')
+        pickle_cache = self.get_cache('pickle')
+        self.assertEqual(pickle_cache.reinsert_keys(), 1)
+        # Uncompressed, the value is stored in chunks.
+        self.assertEqual(self.get_raw_type('a'), b'hash')
+        self.assertEqual(pickle_cache.get('a'), 'a' * 5000)
+        self.assertAlmostEqual(pickle_cache.ttl('a'), 100, delta=1)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+from django.test import TestCase, override_settings
+
+from redis_cache.codec import CodecPool
+from tests.testapp.tests.base_tests import BaseRedisTestCase, SetupMixin
+
+
+LOCATION = "127.0.0.1:6381"
+LOCATIONS = [
+    '127.0.0.1:6381',
+    '127.0.0.1:6382',
+    '127.0.0.1:6383',
+]
+
+
+class CodecPoolTestCase(object):
+
+    def test_large_batches(self):
+        data = {'key%d' % i: {'value': 'v' * i} for i in range(100)}
+        data['bytes'] = b'b' * 100
+        data['int'] = 5
+        self.cache.set_many(data)
+        self.assertEqual(self.cache.get_many(list(data) + ['missing']), data)
+
+    def test_small_batches_not_pooled(self):
+        with patch.object(CodecPool, 'get_executor') as get_executor:
+            self.cache.set_many({'a': 'a', 'b': 'b'})
+            self.assertEqual(self.cache.get_many(['a', 'b']), {'a': 'a', 'b': 'b'})
+        self.assertFalse(get_executor.called)
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'redis_cache.RedisCache',
+            'LOCATION': LOCATION,
+            'OPTIONS': {
+                'DB': 15,
+                'PASSWORD': 'yadayada',
+                'PARSER_CLASS': 'redis.connection.HiredisParser',
+                'PICKLE_VERSION': -1,
+                'COMPRESSOR_CLASS': 'redis_cache.compressors.ZLibCompressor',
+                'CODEC_POOL': 'thread',
+                'CODEC_POOL_SIZE': 4,
+                'CODEC_POOL_MIN_ITEMS': 8,
+                'CONNECTION_POOL_CLASS': 'redis.ConnectionPool',
+                'CONNECTION_POOL_CLASS_KWARGS': {
+                    'max_connections': 2,
+                },
+            },
+        },
+    }
+)
+class ThreadCodecPoolTestCase(CodecPoolTestCase, BaseRedisTestCase, TestCase):
+    pass
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'redis_cache.ShardedRedisCache',
+            'LOCATION': LOCATIONS,
+            'OPTIONS': {
+                'DB': 15,
+                'PASSWORD': 'yadayada',
+                'PARSER_CLASS': 'redis.connection.HiredisParser',
+                'PICKLE_VERSION': -1,
+                'COMPRESSOR_CLASS': 'redis_cache.compressors.ZLibCompressor',
+                'CODEC_POOL': 'process',
+                'CODEC_POOL_SIZE': 2,
+                'CODEC_POOL_MIN_ITEMS': 8,
+                'CONNECTION_POOL_CLASS': 'redis.ConnectionPool',
+                'CONNECTION_POOL_CLASS_KWARGS': {
+                    'max_connections': 2,
+                },
+            },
+        },
+    }
+)
+class ProcessCodecPoolTestCase(CodecPoolTestCase, SetupMixin, TestCase):
+    pass
@@ -1,7 +1,15 @@
 # -*- coding: utf-8 -*-
+from io import StringIO
+import os
+import tempfile
+
+from django.core.management import call_command
 from django.test import TestCase, override_settings
+import zstandard
 
-from tests.testapp.tests.base_tests import BaseRedisTestCase
+from redis_cache.compressors import ZstdCompressor
+from redis_cache.constants import FRAME_COMPRESSOR_MASK
+from tests.testapp.tests.base_tests import BaseRedisTestCase, SetupMixin
 
 LOCATION = "127.0.0.1:6381"
 
@@ -26,6 +34,15 @@ class CompressionTestCase(object):
             len(noop_client.get(versioned_key)),
         )
 
+    def is_compressed(self, value):
+        return bool(self.cache.prep_value(value)[1] & FRAME_COMPRESSOR_MASK)
+
+    def test_incompressible_values_stored_uncompressed(self):
+        value = os.urandom(64)
+        self.assertFalse(self.is_compressed(value))
+        self.cache.set('a', value)
+        self.assertEqual(self.cache.get('a'), value)
+
 
 @override_settings(
     CACHES={
@@ -99,3 +116,225 @@ class ZLibTestCase(CompressionTestCase, BaseRedisTestCase, TestCase):
 )
 class BZip2TestCase(CompressionTestCase, BaseRedisTestCase, TestCase):
     pass
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'redis_cache.RedisCache',
+            'LOCATION': LOCATION,
+            'OPTIONS': {
+                'DB': 14,
+                'PASSWORD': 'yadayada',
+                'PARSER_CLASS': 'redis.connection.HiredisParser',
+                'PICKLE_VERSION': -1,
+                'COMPRESSOR_CLASS': 'redis_cache.compressors.ZstdCompressor',
+                'COMPRESSOR_CLASS_KWARGS': {
+                    'level': 3,
+                },
+                'CONNECTION_POOL_CLASS': 'redis.ConnectionPool',
+                'CONNECTION_POOL_CLASS_KWARGS': {
+                    'max_connections': 2,
+                },
+            },
+        },
+        'noop': {
+            'BACKEND': 'redis_cache.RedisCache',
+            'LOCATION': LOCATION,
+            'OPTIONS': {
+                'DB': 15,
+                'PASSWORD': 'yadayada',
+                'PARSER_CLASS': 'redis.connection.HiredisParser',
+                'PICKLE_VERSION': -1,
+                'COMPRESSOR_CLASS': 'redis_cache.compressors.NoopCompressor',
+            },
+        },
+    }
+)
+class ZstdTestCase(CompressionTestCase, BaseRedisTestCase, TestCase):
+    pass
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'redis_cache.RedisCache',
+            'LOCATION': LOCATION,
+            'OPTIONS': {
+                'DB': 14,
+                'PASSWORD': 'yadayada',
+                'PARSER_CLASS': 'redis.connection.HiredisParser',
+                'PICKLE_VERSION': -1,
+                'COMPRESSOR_CLASS': 'redis_cache.compressors.LZ4Compressor',
+                'COMPRESSOR_CLASS_KWARGS': {
+                    'compression_level': 0,
+                },
+                'CONNECTION_POOL_CLASS': 'redis.ConnectionPool',
+                'CONNECTION_POOL_CLASS_KWARGS': {
+                    'max_connections': 2,
+                },
+            },
+        },
+        'noop': {
+            'BACKEND': 'redis_cache.RedisCache',
+            'LOCATION': LOCATION,
+            'OPTIONS': {
+                'DB': 15,
+                'PASSWORD': 'yadayada',
+                'PARSER_CLASS': 'redis.connection.HiredisParser',
+                'PICKLE_VERSION': -1,
+                'COMPRESSOR_CLASS': 'redis_cache.compressors.NoopCompressor',
+            },
+        },
+    }
+)
+class LZ4TestCase(CompressionTestCase, BaseRedisTestCase, TestCase):
+    pass
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'redis_cache.RedisCache',
+            'LOCATION': LOCATION,
+            'OPTIONS': {
+                'DB': 14,
+                'PASSWORD': 'yadayada',
+                'PARSER_CLASS': 'redis.connection.HiredisParser',
+                'COMPRESSOR_CLASS': 'redis_cache.compressors.ZLibCompressor',
+                'MIN_COMPRESS_SIZE': 100,
+                'MIN_COMPRESS_SAVINGS': 0.5,
+                'CONNECTION_POOL_CLASS': 'redis.ConnectionPool',
+                'CONNECTION_POOL_CLASS_KWARGS': {
+                    'max_connections': 2,
+                },
+            },
+        },
+        'noop': {
+            'BACKEND': 'redis_cache.RedisCache',
+            'LOCATION': LOCATION,
+            'OPTIONS': {
+                'DB': 15,
+                'PASSWORD': 'yadayada',
+                'PARSER_CLASS': 'redis.connection.HiredisParser',
+                'COMPRESSOR_CLASS': 'redis_cache.compressors.NoopCompressor',
+            },
+        },
+    }
+)
+class CompressionThresholdTestCase(CompressionTestCase, BaseRedisTestCase, TestCase):
+
+    def test_min_compress_size(self):
+        self.assertFalse(self.is_compressed(50 * 'a'))
+        self.assertTrue(self.is_compressed(1000 * 'a'))
+
+    def test_min_compress_savings(self):
+        # Half random, half repeated: compresses, but by less than 50%.
+        value = os.urandom(600) + 400 * b'a'
+        self.assertFalse(self.is_compressed(value))
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'redis_cache.RedisCache',
+            'LOCATION': LOCATION,
+            'OPTIONS': {
+                'DB': 14,
+                'PASSWORD': 'yadayada',
+                'PARSER_CLASS': 'redis.connection.HiredisParser',
+                'COMPRESSOR_CLASS': 'redis_cache.compressors.ZstdCompressor',
+                'COMPRESSOR_CLASS_KWARGS': {
+                    'dictionary_key': 'zstd-dictionary',
+                },
+            },
+        },
+        'samples': {
+            'BACKEND': 'redis_cache.RedisCache',
+            'LOCATION': LOCATION,
+            'OPTIONS': {
+                'DB': 14,
+                'PASSWORD': 'yadayada',
+                'PARSER_CLASS': 'redis.connection.HiredisParser',
+            },
+        },
+    }
+)
+class ZstdDictionaryTestCase(SetupMixin, TestCase):
+
+    def make_value(self, i):
+        return {'id': i, 'name': 'User %d' % i, 'email': 'user%d@example.com' % i}
+
+    def train(self, size=4096, **options):
+        samples = self.get_cache('samples')
+        samples.set_many({'user:%d' % i: self.make_value(i) for i in range(1000)})
+        call_command(
+            'train_compression_dictionary', cache='samples', size=size,
+            stdout=StringIO(), **options
+        )
+
+    def test_dictionary_key(self):
+        self.train(key='zstd-dictionary')
+        value = self.make_value(1001)
+        self.cache.set('a', value)
+        self.assertEqual(self.cache.get('a'), value)
+        self.assertIsNotNone(self.cache.compressor.get_dictionary())
+
+        serialized = self.cache.serialize(value)
+        self.assertLess(
+            len(self.cache.compressor.compress(serialized)),
+            len(ZstdCompressor().compress(serialized)),
+        )
+
+    def fresh_cache(self):
+        return type(self.cache)(self.cache.server, self.cache.params)
+
+    def test_retrained_dictionary(self):
+        self.train(key='zstd-dictionary')
+        value = self.make_value(1001)
+        self.cache.set('a', value)
+        self.cache.set('b', 'b')
+        self.train(key='zstd-dictionary', size=2048)
+        cache = self.fresh_cache()
+        self.assertNotEqual(
+            cache.compressor.get_dictionary().dict_id(),
+            self.cache.compressor.get_dictionary().dict_id(),
+        )
+        # Values compressed with the old dictionary are missing.
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('a', 'default'), 'default')
+        self.assertEqual(cache.get_many(['a', 'b']), {'b': 'b'})
+        with cache.pipeline() as p:
+            a = p.get('a')
+        self.assertIsNone(a.result())
+
+    def test_missing_dictionary(self):
+        self.train(key='zstd-dictionary')
+        value = self.make_value(1001)
+        self.cache.set('a', value)
+        self.cache.get_client('zstd-dictionary', write=True).delete('zstd-dictionary')
+        cache = self.fresh_cache()
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get_many(['a']), {})
+
+    def test_dictionary_loaded_later(self):
+        compressor = self.cache.compressor
+        compressor.dictionary_retry_interval = 0
+        value = self.cache.serialize(self.make_value(1001))
+        compressed = compressor.compress(value)
+        self.assertEqual(zstandard.get_frame_parameters(compressed).dict_id, 0)
+        self.train(key='zstd-dictionary')
+        compressed = compressor.compress(value)
+        self.assertEqual(
+            zstandard.get_frame_parameters(compressed).dict_id,
+            compressor.get_dictionary().dict_id(),
+        )
+        self.assertEqual(compressor.decompress(compressed), value)
+
+    def test_dictionary_file(self):
+        with tempfile.NamedTemporaryFile() as f:
+            self.train(output=f.name)
+            compressor = ZstdCompressor(dictionary=f.name)
+            value = self.cache.serialize(self.make_value(1001))
+            self.assertEqual(compressor.decompress(compressor.compress(value)), value)
+            self.assertIsNotNone(compressor.get_dictionary())
@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+import time
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+import redis
+
+from redis_cache.connection import (
+    AutoPipelineConnectionPool, ThreadAffineConnectionPool, pool,
+)
+from tests.testapp.tests.base_tests import BaseRedisTestCase, SetupMixin
+
+
+LOCATION = "127.0.0.1:6381"
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'redis_cache.RedisCache',
+            'LOCATION': LOCATION,
+            'OPTIONS': {
+                'DB': 15,
+                'PASSWORD': 'yadayada',
+                'PARSER_CLASS': 'redis.connection.HiredisParser',
+                'PICKLE_VERSION': -1,
+                'CONNECTION_POOL_CLASS': 'redis_cache.connection.AutoPipelineConnectionPool',
+                'CONNECTION_POOL_CLASS_KWARGS': {
+                    'max_connections': 2,
+                },
+            },
+        },
+    }
+)
+class AutoPipelineTestCase(BaseRedisTestCase, TestCase):
+
+    def test_connection_pool_class(self):
+        for client in self.cache.clients.values():
+            self.assertIsInstance(client.connection_pool, AutoPipelineConnectionPool)
+
+    def test_max_connections(self):
+        # Every command is multiplexed over a single shared connection.
+        for i in range(10):
+            self.cache.set('a', i)
+        for client in self.cache.clients.values():
+            self.assertEqual(client.connection_pool._created_connections, 1)
+
+    def test_concurrent_commands(self):
+        errors = []
+
+        def worker(n):
+            try:
+                for i in range(100):
+                    key = '{0}:{1}'.format(n, i)
+                    self.cache.set(key, (n, i))
+                    self.assertEqual(self.cache.get(key), (n, i))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        for client in self.cache.clients.values():
+            self.assertEqual(client.connection_pool._created_connections, 1)
+
+    def test_multiplexer_connection_stats(self):
+        self.cache.set('a', 'a')
+        for client in self.cache.clients.values():
+            stats = client.connection_pool.stats()
+            self.assertEqual((stats['created'], stats['in_use'], stats['idle']), (1, 0, 1))
+
+    def test_multiplexer_connection_recycled(self):
+        self.cache.set('a', 'a')
+        client, = self.cache.clients.values()
+        connection_pool = client.connection_pool
+        connection = connection_pool.get_multiplexer().connection
+        connected_at = connection.connected_at
+        connection_pool.max_connection_age = 0.01
+        time.sleep(0.02)
+        self.assertEqual(self.cache.get('a'), 'a')
+        self.assertGreater(connection.connected_at, connected_at)
+        self.assertEqual(connection_pool.stats()['recycled'], 1)
+
+    def test_multiplexer_connection_unread_data(self):
+        self.cache.set('a', 'a')
+        client, = self.cache.clients.values()
+        connection = client.connection_pool.get_multiplexer().connection
+        # A reply nobody reads would be handed to the next command.
+        connection.send_command('PING')
+        self.assertEqual(self.cache.get('a'), 'a')
+
+    def test_pending_reply_timeout(self):
+        self.cache.set('a', 'a')
+        client, = self.cache.clients.values()
+        multiplexer = client.connection_pool.get_multiplexer()
+        connection = multiplexer.connection
+        self.addCleanup(setattr, connection, 'socket_timeout', connection.socket_timeout)
+        connection.socket_timeout = 0.01
+        leader = multiplexer.submit(('PING',))
+        waiter = multiplexer.submit(('GET', self.cache.make_key('a')))
+        # Nobody collects the leader's reply, so nothing is flushed.
+        with self.assertRaises(redis.TimeoutError):
+            waiter.get()
+        # The command given up on is not sent.
+        self.assertEqual(leader.get(), b'PONG')
+        self.assertFalse(waiter._done)
+        self.assertEqual(self.cache.get('a'), 'a')
+
+    def test_response_error_is_delivered_to_caller(self):
+        self.cache.set('a', 'a')
+        client = self.cache.get_client(self.cache.make_key('a'), write=True)
+        with self.assertRaises(Exception):
+            client.incr(self.cache.make_key('a'))
+        self.assertEqual(self.cache.get('a'), 'a')
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'redis_cache.RedisCache',
+            'LOCATION': LOCATION,
+            'OPTIONS': {
+                'DB': 15,
+                'PASSWORD': 'yadayada',
+                'PARSER_CLASS': 'redis.connection.HiredisParser',
+                'MAX_CONNECTIONS': 2,
+                'POOL_TIMEOUT': 0.01,
+                'WARM_CONNECTIONS': 2,
+            },
+        },
+    }
+)
+class ConnectionPoolLimitsTestCase(SetupMixin, TestCase):
+
+    def get_pool(self):
+        client, = self.cache.clients.values()
+        return client.connection_pool
+
+    def test_blocking_pool(self):
+        connection_pool = self.get_pool()
+        self.assertIsInstance(connection_pool, redis.BlockingConnectionPool)
+        self.assertEqual(connection_pool.max_connections, 2)
+        self.assertEqual(connection_pool.timeout, 0.01)
+
+    def test_warm_connections(self):
+        stats, = self.cache.connection_stats().values()
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['idle'], 2)
+        self.assertEqual(stats['in_use'], 0)
+        self.assertEqual(stats['checkouts'], 0)
+
+    def test_stats(self):
+        self.cache.set('a', 'a')
+        self.assertEqual(self.cache.get('a'), 'a')
+        stats = self.get_pool().stats()
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertGreater(stats['wait_time'], 0)
+        self.assertGreaterEqual(stats['wait_time'], stats['max_wait_time'])
+        self.assertEqual(stats['exhausted'], 0)
+
+    def test_exhausted(self):
+        connection_pool = self.get_pool()
+        connections = [connection_pool.get_connection('GET') for _ in range(2)]
+        self.assertEqual(connection_pool.stats()['in_use'], 2)
+        with self.assertRaises(redis.ConnectionError):
+            connection_pool.get_connection('GET')
+        for connection in connections:
+            connection_pool.release(connection)
+        stats = connection_pool.stats()
+        self.assertEqual(stats['exhausted'], 1)
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['idle'], 2)
+
+    def test_warm_timeout(self):
+        connection_pool = self.get_pool()
+        connection_pool.disconnect()
+        connection_class = connection_pool.connection_class
+        with mock.patch.object(connection_class, 'connect', side_effect=redis.TimeoutError):
+            self.assertEqual(connection_pool.warm(2), 0)
+        self.assertEqual(connection_pool.stats()['in_use'], 0)
+
+    def fake_fork(self, connection_pool):
+        # Pretend the pool was created by a parent process.
+        inherited = connection_pool.get_connections()
+        connection_pool.pid = -1
+        for connection in inherited:
+            connection.pid = -1
+        return inherited
+
+    def test_reset_after_fork(self):
+        self.cache.set('a', 'a')
+        connection_pool = self.get_pool()
+        inherited = self.fake_fork(connection_pool)
+        self.assertEqual(self.cache.get('a'), 'a')
+        for connection in inherited:
+            self.assertIsNone(connection._sock)
+        stats = connection_pool.stats()
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['checkouts'], 1)
+        self.assertNotIn(connection_pool.get_connections()[0], inherited)
+
+    def test_after_fork(self):
+        connection_pool = self.get_pool()
+        inherited = self.fake_fork(connection_pool)
+        pool.pid = -1
+        type(self.cache)(self.cache.server, self.cache.params)
+        self.assertEqual(pool.pid, os.getpid())
+        self.assertEqual(connection_pool.pid, os.getpid())
+        for connection in inherited:
+            self.assertIsNone(connection._sock)
+        self.assertEqual(connection_pool.stats()['idle'], 2)
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'redis_cache.RedisCache',
+            'LOCATION': LOCATION,
+            'OPTIONS': {
+                'DB': 15,
+                'PASSWORD': 'yadayada',
+                'PARSER_CLASS': 'redis.connection.HiredisParser',
+                'MAX_IDLE_TIME': 0.05,
+                'MAX_CONNECTION_AGE': 0.2,
+                'HEALTH_CHECK_INTERVAL': 30,
+                'SOCKET_KEEPALIVE': True,
+            },
+        },
+    }
+)
+class StaleConnectionTestCase(SetupMixin, TestCase):
+
+    def get_pool(self):
+        client, = self.cache.clients.values()
+        return client.connection_pool
+
+    def test_connection_kwargs(self):
+        connection_pool = self.get_pool()
+        self.assertEqual(connection_pool.max_idle_time, 0.05)
+        self.assertEqual(connection_pool.max_connection_age, 0.2)
+        self.assertEqual(connection_pool.connection_kwargs['health_check_interval'], 30)
+        self.assertTrue(connection_pool.connection_kwargs['socket_keepalive'])
+
+    def test_idle_connection_recycled(self):
+        self.cache.set('a', 'a')
+        connection_pool = self.get_pool()
+        connection, = connection_pool.get_connections()
+        sock = connection._sock
+        self.assertEqual(self.cache.get('a'), 'a')
+        self.assertIs(connection._sock, sock)
+        time.sleep(0.1)
+        self.assertEqual(self.cache.get('a'), 'a')
+        self.assertIsNot(connection._sock, sock)
+        self.assertEqual(connection_pool.stats()['recycled'], 1)
+
+    def test_old_connection_recycled(self):
+        self.cache.set('a', 'a')
+        connection_pool = self.get_pool()
+        connection, = connection_pool.get_connections()
+        deadline = time.monotonic() + 0.3
+        while time.monotonic() < deadline:
+            self.assertEqual(self.cache.get('a'), 'a')
+            time.sleep(0.01)
+        self.assertGreaterEqual(connection_pool.stats()['recycled'], 1)
+        self.assertLess(time.monotonic() - connection.connected_at, 0.2)
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'redis_cache.RedisCache',
+            'LOCATION': LOCATION,
+            'OPTIONS': {
+                'DB': 15,
+                'PASSWORD': 'yadayada',
+                'PARSER_CLASS': 'redis.connection.HiredisParser',
+                'PICKLE_VERSION': -1,
+                'CONNECTION_POOL_CLASS': 'redis_cache.connection.ThreadAffineConnectionPool',
+                'CONNECTION_POOL_CLASS_KWARGS': {
+                    'max_connections': 2,
+                    'max_thread_connections': 1,
+                },
+            },
+        },
+    }
+)
+class ThreadAffineTestCase(BaseRedisTestCase, TestCase):
+
+    def get_pool(self):
+        client, = self.cache.clients.values()
+        return client.connection_pool
+
+    def test_connection_pool_class(self):
+        self.assertIsInstance(self.get_pool(), ThreadAffineConnectionPool)
+
+    def test_sticky_connection(self):
+        connection_pool = self.get_pool()
+        for i in range(10):
+            self.cache.set('a', i)
+        self.assertEqual(connection_pool._created_connections, 1)
+        self.assertEqual(len(connection_pool._thread_connections), 1)
+        self.assertEqual(connection_pool._available_connections, [])
+
+    def test_nested_connection(self):
+        connection_pool = self.get_pool()
+        connection = connection_pool.get_connection('GET')
+        other = connection_pool.get_connection('GET')
+        self.assertIsNot(other, connection)
+        self.assertNotIn(other, connection_pool._thread_connections)
+        connection_pool.release(other)
+        connection_pool.release(connection)
+        self.assertIs(connection_pool.get_connection('GET'), connection)
+        connection_pool.release(connection)
+        stats = connection_pool.stats()
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['in_use'], 0)
+        self.assertEqual(stats['idle'], 2)
+
+    def test_checkouts_not_recorded(self):
+        connection_pool = self.get_pool()
+        self.cache.set('a', 'a')
+        self.assertEqual(connection_pool.stats()['checkouts'], 0)
+        connection_pool.record_checkouts = True
+        self.assertEqual(self.cache.get('a'), 'a')
+        self.assertEqual(connection_pool.stats()['checkouts'], 1)
+
+    def test_concurrent_commands(self):
+        errors = []
+        connection_pool = self.get_pool()
+        connection_pool.max_connections = 16
+        connection_pool.max_thread_connections = 4
+
+        def worker(n):
+            try:
+                for i in range(100):
+                    key = '{0}:{1}'.format(n, i)
+                    self.cache.set(key, (n, i))
+                    self.assertEqual(self.cache.get(key), (n, i))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(connection_pool._thread_connections), 4)
+
+    def test_shared_pool_not_starved(self):
+        client_pool = self.get_pool()
+        connection_pool = pool.get_pool_class(ThreadAffineConnectionPool)(
+            max_connections=4,
+            connection_class=client_pool.connection_class,
+            **client_pool.connection_kwargs
+        )
+        self.assertEqual(connection_pool.max_thread_connections, 2)
+        barrier = threading.Barrier(5)
+        done = threading.Event()
+
+        def worker():
+            connection = connection_pool.get_connection('GET')
+            barrier.wait()
+            connection_pool.release(connection)
+            barrier.wait()
+            done.wait()
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        barrier.wait()
+        try:
+            # Two threads hold a connection of their own, idle but not
+            # available to this thread.
+            self.assertEqual(len(connection_pool._thread_connections), 2)
+            connections = [connection_pool.get_connection('GET') for _ in range(2)]
+            with self.assertRaises(redis.ConnectionError):
+                connection_pool.get_connection('GET')
+            stats = connection_pool.stats()
+            self.assertEqual((stats['created'], stats['in_use'], stats['idle']), (4, 4, 0))
+            self.assertEqual(stats['exhausted'], 1)
+            for connection in connections:
+                connection_pool.release(connection)
+        finally:
+            done.set()
+            for thread in threads:
+                thread.join()
+            connection_pool.disconnect()
+
+    def test_thread_exit(self):
+        connection_pool = self.get_pool()
+        thread = threading.Thread(target=self.cache.set, args=('a', 'a'))
+        thread.start()
+        thread.join()
+        del thread
+        self.assertEqual(len(connection_pool._thread_connections), 0)
+        self.assertEqual(len(connection_pool._available_connections), 1)
+        self.assertEqual(self.cache.get('a'), 'a')
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.test import TestCase, override_settings
+
+from tests.testapp.tests.base_tests import SetupMixin
+
+
+LOCATION = "127.0.0.1:6381"
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'redis_cache.RedisCache',
+        'LOCATION': LOCATION,
+        'OPTIONS': {
+            'DB': 1,
+            'PASSWORD': 'yadayada',
+            'PARSER_CLASS': 'redis.connection.HiredisParser',
+            'SERIALIZER_CLASS': 'redis_cache.serializers.JSONSerializer',
+            'COMPRESSOR_CLASS': 'redis_cache.compressors.ZLibCompressor',
+            'LEGACY_SERIALIZER_CLASS': 'redis_cache.serializers.PickleSerializer',
+            'LEGACY_COMPRESSOR_CLASS': 'redis_cache.compressors.NoopCompressor',
+            'REWRITE_ON_READ': True,
+        },
+    },
+    'pickle': {
+        'BACKEND': 'redis_cache.RedisCache',
+        'LOCATION': LOCATION,
+        'OPTIONS': {
+            'DB': 1,
+            'PASSWORD': 'yadayada',
+            'PARSER_CLASS': 'redis.connection.HiredisParser',
+        },
+    },
+})
+class FormatMigrationTestCase(SetupMixin, TestCase):
+
+    def get_raw(self, key):
+        key = self.cache.make_key(key)
+        return self.cache.get_client(key).get(key)
+
+    def set_raw(self, key, value):
+        key = self.cache.make_key(key)
+        self.cache.get_client(key, write=True).set(key, value)
+
+    def test_reads_other_formats(self):
+        pickle_cache = self.get_cache('pickle')
+        pickle_cache.set('a', {'a': 1}, timeout=None)
+        self.set_raw('b', pickle_cache.serialize(['b']))
+        self.assertEqual(self.cache.get('a'), {'a': 1})
+        self.assertEqual(self.cache.get_many(['a', 'b']), {'a': {'a': 1}, 'b': ['b']})
+
+    def test_rewrite_on_read(self):
+        pickle_cache = self.get_cache('pickle')
+        pickle_cache.set('a', {'a': 1}, timeout=60)
+        pickle_cache.set('b', 'b', timeout=None)
+        pickle_cache.set('c', 3)
+        self.assertEqual(self.cache.get('a'), {'a': 1})
+        self.assertEqual(self.cache.get_many(['b', 'c']), {'b': 'b', 'c': 3})
+
+        headers = (self.cache.frame_header, self.cache.uncompressed_frame_header)
+        self.assertIn(self.get_raw('a')[:2], headers)
+        self.assertIn(self.get_raw('b')[:2], headers)
+        self.assertEqual(self.get_raw('c'), b'3')
+        self.assertGreater(self.cache.ttl('a'), 0)
+        self.assertIsNone(self.cache.ttl('b'))
+
+    def test_rewrite_skips_changed_values(self):
+        pickle_cache = self.get_cache('pickle')
+        pickle_cache.set('a', 'old')
+        original = self.get_raw('a')
+        pickle_cache.set('a', 'new')
+        self.cache.rewrite_values([(self.cache.make_key('a'), original, 'old')])
+        self.assertEqual(self.cache.get('a'), 'new')
+
+    def test_is_stale(self):
+        self.assertFalse(self.cache.is_stale(self.cache.prep_value('a')))
+        self.assertFalse(self.cache.is_stale(b'12'))
+        self.assertTrue(self.cache.is_stale(self.get_cache('pickle').prep_value('a')))
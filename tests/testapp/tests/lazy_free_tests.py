@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+import redis
+
+from tests.testapp.tests.base_tests import BaseRedisTestCase
+
+
+LOCATION = "127.0.0.1:6381"
+LOCATIONS = [
+    '127.0.0.1:6381',
+    '127.0.0.1:6382',
+    '127.0.0.1:6383',
+]
+
+
+class LazyFreeTestCase(object):
+
+    def test_lazy_free_option(self):
+        self.assertTrue(self.cache.lazy_free)
+
+    def test_delete_uses_unlink(self):
+        self.cache.set('a', 'a')
+        with mock.patch.object(redis.Redis, 'delete', side_effect=AssertionError):
+            self.assertEqual(self.cache.delete('a'), 1)
+            self.assertEqual(self.cache.delete('a'), 0)
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_delete_many_uses_unlink(self):
+        self.cache.set_many({'a': 'a', 'b': 'b', 'c': 'c'})
+        with mock.patch.object(redis.Redis, 'delete', side_effect=AssertionError):
+            self.cache.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'c': 'c'})
+
+    def test_clear_flushes_asynchronously(self):
+        self.cache.set_many({'a': 'a', 'b': 'b'})
+        with mock.patch.object(redis.Redis, 'flushdb', autospec=True, side_effect=redis.Redis.flushdb) as flushdb:
+            self.cache.clear()
+        for call in flushdb.call_args_list:
+            self.assertEqual(call[1], {'asynchronous': True})
+        self.assertEqual(self.cache.get_many(['a', 'b']), {})
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'redis_cache.RedisCache',
+            'LOCATION': LOCATION,
+            'OPTIONS': {
+                'DB': 15,
+                'PASSWORD': 'yadayada',
+                'PARSER_CLASS': 'redis.connection.HiredisParser',
+                'PICKLE_VERSION': -1,
+                'LAZY_FREE': True,
+                'CONNECTION_POOL_CLASS': 'redis.ConnectionPool',
+                'CONNECTION_POOL_CLASS_KWARGS': {
+                    'max_connections': 2,
+                },
+            },
+        },
+    }
+)
+class SingleLazyFreeTestCase(LazyFreeTestCase, BaseRedisTestCase, TestCase):
+    pass
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'redis_cache.ShardedRedisCache',
+            'LOCATION': LOCATIONS,
+            'OPTIONS': {
+                'DB': 15,
+                'PASSWORD': 'yadayada',
+                'PARSER_CLASS': 'redis.connection.HiredisParser',
+                'PICKLE_VERSION': -1,
+                'LAZY_FREE': True,
+                'CONNECTION_POOL_CLASS': 'redis.ConnectionPool',
+                'CONNECTION_POOL_CLASS_KWARGS': {
+                    'max_connections': 2,
+                },
+            },
+        },
+    }
+)
+class MultipleLazyFreeTestCase(LazyFreeTestCase, BaseRedisTestCase, TestCase):
+    pass
@@ -1,8 +1,33 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+import pickle
+from unittest import mock, skipUnless
+from uuid import UUID
+
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models.signals import post_init
 from django.test import TestCase, override_settings
+from django.utils.timezone import get_fixed_timezone
+from django.utils.translation import gettext_lazy
+import pytz
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from redis_cache.compressors import ZLibCompressor
+from redis_cache.serializers import ModelSerializer, PickleSerializer, SerializationError
+from tests.testapp.models import Poll, expensive_calculation
 from tests.testapp.tests.base_tests import SetupMixin
 
 
@@ -19,6 +44,10 @@ class C:
         return 24
 
 
+class UnframedCompressor(ZLibCompressor):
+    compressor_id = None
+
+
 class BaseSerializerTestCase(SetupMixin, TestCase):
     converts_tuple_to_list = False
     serializes_objects = True
@@ -115,6 +144,65 @@ class PickleSerializerTestCase2(BaseSerializerTestCase):
         self.assertEqual(self.cache.serializer.pickle_version, 2)
 
 
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'redis_cache.RedisCache',
+        'LOCATION': LOCATION,
+        'OPTIONS': {
+            'DB': 1,
+            'PASSWORD': 'yadayada',
+            'PARSER_CLASS': 'redis.connection.HiredisParser',
+            'PICKLE_VERSION': 5,
+            'SERIALIZER_CLASS': 'redis_cache.serializers.PickleSerializer',
+            'SERIALIZER_CLASS_KWARGS': {
+                'out_of_band_buffers': True,
+            },
+        },
+    },
+})
+class PickleOutOfBandSerializerTestCase(BaseSerializerTestCase):
+    converts_tuple_to_list = False
+    serializes_objects = True
+
+    def test_out_of_band_buffers(self):
+        value = [pickle.PickleBuffer(b'a' * 1000), 'b', pickle.PickleBuffer(b'c' * 10)]
+        serialized = self.cache.serialize(value)
+        self.assertEqual(serialized[:1], self.cache.serializer.out_of_band_marker)
+        self.cache.set('a', value)
+        a, b, c = self.cache.get('a')
+        self.assertEqual((bytes(a), b, bytes(c)), (b'a' * 1000, 'b', b'c' * 10))
+
+    def test_out_of_band_buffers_framed_in_one_join(self):
+        value = [pickle.PickleBuffer(b'a' * 1000), 'b']
+        serializer = self.cache.serializer
+        with mock.patch.object(serializer, 'pack_buffers', wraps=serializer.pack_buffers) as pack_buffers:
+            prepared = self.cache.prep_value(value)
+        # The frame header is joined with the parts rather than prepended.
+        self.assertEqual(pack_buffers.call_args[1]['prefix'], self.cache.frame_header)
+        self.assertEqual(prepared, self.cache.frame_header + self.cache.serialize(value))
+        a, b = self.cache.get_value(prepared)
+        self.assertEqual((bytes(a), b), (b'a' * 1000, 'b'))
+
+    def test_out_of_band_buffers_off_by_default(self):
+        serializer = PickleSerializer(pickle_version=5)
+        value = [pickle.PickleBuffer(b'a' * 1000), 'b']
+        serialized = serializer.serialize(value)
+        self.assertNotEqual(serialized[:1], serializer.out_of_band_marker)
+        self.assertEqual(serializer.deserialize(serialized), [b'a' * 1000, 'b'])
+        # Values stored with out-of-band buffers are still read back.
+        a, b = serializer.deserialize(self.cache.serialize(value))
+        self.assertEqual((bytes(a), b), (b'a' * 1000, 'b'))
+
+    @skipUnless(numpy, "numpy is not installed")
+    def test_numpy_array(self):
+        value = numpy.arange(100000, dtype='float64')
+        self.cache.set('a', value)
+        result = self.cache.get('a')
+        self.assertTrue(numpy.array_equal(result, value))
+        # The array is a view of the value read from redis.
+        self.assertFalse(result.flags.writeable)
+
+
 @override_settings(CACHES={
     'default': {
         'BACKEND': 'redis_cache.RedisCache',
@@ -150,6 +238,56 @@ class MSGPackSerializerTestCase(BaseSerializerTestCase):
     converts_tuple_to_list = True
     serializes_objects = False
 
+    def test_ext_types(self):
+        values = {
+            'datetime': datetime(2020, 1, 2, 3, 4, 5, 6),
+            'date': date(2020, 1, 2),
+            'time': time(3, 4, 5),
+            'decimal': Decimal('1.50'),
+            'uuid': UUID('12345678123456781234567812345678'),
+            'set': {1, 'a', frozenset([2])},
+            'bytes': b'\x00\xff',
+            'int keys': {1: 'a'},
+        }
+        self.cache.set('a', values)
+        self.assertEqual(self.cache.get('a'), values)
+
+    def test_aware_time(self):
+        value = time(3, 4, 5, 6, tzinfo=get_fixed_timezone(-90))
+        self.cache.set('a', value)
+        result = self.cache.get('a')
+        self.assertEqual(result, value)
+        self.assertEqual(result.utcoffset(), timedelta(minutes=-90))
+        self.assertEqual(self.cache.get_many(['a']), {'a': value})
+        # Without a date, the UTC offset of Europe/Paris is unknown.
+        with self.assertRaises(SerializationError):
+            self.cache.set('a', time(3, 4, 5, tzinfo=pytz.timezone('Europe/Paris')))
+
+    def test_get_many_ext_types(self):
+        values = {
+            'a': {Decimal('1.5')},
+            'b': 'b',
+            'c': datetime(2020, 1, 2),
+            'd': b'd' * 100,
+            'e': 5,
+        }
+        self.cache.set_many(values)
+        self.assertEqual(self.cache.get_many(list(values) + ['f']), values)
+
+    def test_deserialize_many_large_value(self):
+        # Larger than the 100 MiB msgpack unpackers accept by default.
+        value = b'a' * (101 * 1024 * 1024)
+        serializer = self.cache.serializer
+        values = [serializer.serialize(value), serializer.serialize({'b': []})]
+        self.assertEqual(serializer.deserialize_many(values), [value, {'b': []}])
+        self.assertEqual(serializer.deserialize_many([]), [])
+
+    def test_unsupported_type(self):
+        with self.assertRaises(TypeError):
+            self.cache.set('a', C())
+        self.cache.set('a', ['a'])
+        self.assertEqual(self.cache.get('a'), ['a'])
+
 
 @override_settings(CACHES={
     'default': {
@@ -167,3 +305,229 @@ class MSGPackSerializerTestCase(BaseSerializerTestCase):
 class YAMLSerializerTestCase(BaseSerializerTestCase):
     converts_tuple_to_list = False
     serializes_objects = True
+
+
+@skipUnless(numpy, "numpy is not installed")
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'redis_cache.RedisCache',
+        'LOCATION': LOCATION,
+        'OPTIONS': {
+            'DB': 1,
+            'PASSWORD': 'yadayada',
+            'PARSER_CLASS': 'redis.connection.HiredisParser',
+            'SERIALIZER_CLASS': 'redis_cache.serializers.NdarraySerializer',
+        },
+    },
+})
+class NdarraySerializerTestCase(BaseSerializerTestCase):
+    converts_tuple_to_list = False
+    serializes_objects = True
+
+    def get_raw(self, key):
+        key = self.cache.make_key(key)
+        return self.cache.get_client(key).get(key)
+
+    def test_arrays(self):
+        arrays = [
+            numpy.arange(128, dtype='float32'),
+            numpy.arange(12, dtype='>i8').reshape(3, 4),
+            numpy.asfortranarray(numpy.arange(12.0).reshape(3, 4)),
+            numpy.arange(20)[::2],
+            numpy.array(['a', 'bc']),
+        ]
+        for array in arrays:
+            self.cache.set('a', array)
+            self.assertEqual(self.get_raw('a')[:2], self.cache.frame_header)
+            result = self.cache.get('a')
+            self.assertEqual(result.dtype, array.dtype)
+            self.assertTrue(numpy.array_equal(result, array))
+            self.assertFalse(result.flags.writeable)
+
+    def test_fallback(self):
+        self.cache.set('a', numpy.array([{'a': 1}], dtype=object))
+        self.assertEqual(self.get_raw('a')[:2], self.cache.frame_headers[1][1])
+        self.assertEqual(self.cache.get('a')[0], {'a': 1})
+        self.assertFalse(self.cache.is_stale(self.get_raw('a')))
+
+    def test_subclasses(self):
+        masked = numpy.ma.masked_array([1, 2, 3], mask=[False, True, False])
+        self.cache.set('a', masked)
+        self.assertEqual(self.get_raw('a')[:2], self.cache.frame_headers[1][1])
+        result = self.cache.get('a')
+        self.assertIsInstance(result, numpy.ma.MaskedArray)
+        self.assertEqual(result.mask.tolist(), [False, True, False])
+        self.assertEqual(result.compressed().tolist(), [1, 3])
+
+        matrix = numpy.matrix([[1, 2], [3, 4]])
+        self.cache.set('b', matrix)
+        result = self.cache.get('b')
+        self.assertIs(type(result), numpy.matrix)
+        self.assertTrue(numpy.array_equal(result, matrix))
+
+
+@skipUnless(orjson, "orjson is not installed")
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'redis_cache.RedisCache',
+        'LOCATION': LOCATION,
+        'OPTIONS': {
+            'DB': 1,
+            'PASSWORD': 'yadayada',
+            'PARSER_CLASS': 'redis.connection.HiredisParser',
+            'PICKLE_VERSION': 4,
+            'SERIALIZER_CLASS': 'redis_cache.serializers.OrjsonSerializer',
+            'SERIALIZER_CLASS_KWARGS': {
+                'encoders': {'datetime.timedelta': 'builtins.str'},
+            },
+        },
+    },
+    'unframed': {
+        'BACKEND': 'redis_cache.RedisCache',
+        'LOCATION': LOCATION,
+        'OPTIONS': {
+            'DB': 1,
+            'PASSWORD': 'yadayada',
+            'SERIALIZER_CLASS': 'redis_cache.serializers.OrjsonSerializer',
+            'COMPRESSOR_CLASS': 'tests.testapp.tests.serializers_tests.UnframedCompressor',
+        },
+    },
+})
+class OrjsonSerializerTestCase(BaseSerializerTestCase):
+    converts_tuple_to_list = True
+    serializes_objects = False
+
+    def get_raw(self, key):
+        key = self.cache.make_key(key)
+        return self.cache.get_client(key).get(key)
+
+    def test_django_types(self):
+        self.cache.set('a', {
+            'datetime': datetime(2020, 1, 2, 3, 4, 5),
+            'decimal': Decimal('1.50'),
+            'uuid': UUID('12345678123456781234567812345678'),
+            'duration': timedelta(seconds=90),
+            'lazy': gettext_lazy('lazy'),
+        })
+        self.assertEqual(self.get_raw('a')[:2], self.cache.frame_header)
+        self.assertEqual(self.cache.get('a'), {
+            'datetime': '2020-01-02T03:04:05',
+            'decimal': '1.50',
+            'uuid': '12345678-1234-5678-1234-567812345678',
+            'duration': '0:01:30',
+            'lazy': 'lazy',
+        })
+
+    def test_fallback(self):
+        values = {'a': {1: 'a'}, 'b': C, 'c': {1, 2}}
+        self.cache.set_many(values)
+        for key in values:
+            self.assertEqual(self.get_raw(key)[:2], self.cache.frame_headers[1][1])
+        self.assertEqual(self.cache.get_many(list(values)), values)
+
+    def test_fallback_pickle_version(self):
+        self.assertEqual(self.cache.serializer.fallback.pickle_version, 4)
+
+    def test_fallback_requires_framed_values(self):
+        with self.assertRaises(ImproperlyConfigured):
+            caches['unframed']
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'redis_cache.RedisCache',
+        'LOCATION': LOCATION,
+        'OPTIONS': {
+            'DB': 1,
+            'PASSWORD': 'yadayada',
+            'PARSER_CLASS': 'redis.connection.HiredisParser',
+            'SERIALIZER_CLASS': 'redis_cache.serializers.ModelSerializer',
+        },
+    },
+})
+class ModelSerializerTestCase(BaseSerializerTestCase):
+    converts_tuple_to_list = False
+    serializes_objects = True
+
+    def setUp(self):
+        super(ModelSerializerTestCase, self).setUp()
+        expensive_calculation.num_runs = 0
+        for question in ('a', 'b', 'c'):
+            Poll.objects.create(question=question, answer=question.upper())
+
+    def assertPollsEqual(self, polls, expected):
+        self.assertEqual(polls, expected)
+        for poll, expected_poll in zip(polls, expected):
+            self.assertEqual(poll.question, expected_poll.question)
+            self.assertEqual(poll.answer, expected_poll.answer)
+            self.assertEqual(poll.pub_date, expected_poll.pub_date)
+            self.assertFalse(poll._state.adding)
+            self.assertEqual(poll._state.db, 'default')
+
+    def test_instances(self):
+        polls = list(Poll.objects.order_by('pk'))
+        self.cache.set('a', {'first': polls[0], 'all': polls})
+        result = self.cache.get('a')
+        self.assertPollsEqual([result['first']], polls[:1])
+        self.assertPollsEqual(result['all'], polls)
+
+    def test_queryset(self):
+        self.cache.set('a', Poll.objects.order_by('pk'))
+        result = self.cache.get('a')
+        self.assertIsInstance(result, list)
+        self.assertPollsEqual(result, list(Poll.objects.order_by('pk')))
+        self.cache.set('b', Poll.objects.values_list('question', flat=True).order_by('pk'))
+        self.assertEqual(self.cache.get('b'), ['a', 'b', 'c'])
+
+    def test_smaller_than_pickle(self):
+        polls = list(Poll.objects.all())
+        pickle_size = len(pickle.dumps(polls, -1))
+        self.assertLess(len(self.cache.serialize(polls)), pickle_size)
+        self.assertLess(len(self.cache.serialize(Poll.objects.all())), pickle_size)
+
+    def test_deferred_fields(self):
+        polls = list(Poll.objects.defer('answer').order_by('pk'))
+        polls.append(Poll.objects.get(question='a'))
+        self.cache.set('a', polls)
+        result = self.cache.get('a')
+        self.assertEqual([poll.get_deferred_fields() for poll in result], [{'answer'}] * 3 + [set()])
+        self.assertEqual(result[0].question, 'a')
+        self.assertEqual(result[0].answer, 'A')
+
+    def test_unsaved_instance(self):
+        self.cache.set('a', Poll(question='d'))
+        result = self.cache.get('a')
+        self.assertTrue(result._state.adding)
+        self.assertEqual(result.question, 'd')
+
+    def count_post_init(self):
+        initialized = []
+
+        def receiver(instance, **kwargs):
+            initialized.append(instance)
+
+        post_init.connect(receiver, sender=Poll, weak=False, dispatch_uid='model_serializer')
+        self.addCleanup(post_init.disconnect, sender=Poll, dispatch_uid='model_serializer')
+        return initialized
+
+    def test_instance_database(self):
+        polls = list(Poll.objects.order_by('pk'))
+        polls[1]._state.db = 'other'
+        self.cache.set('a', {'first': polls[1], 'all': polls})
+        result = self.cache.get('a')
+        self.assertEqual(result['first']._state.db, 'other')
+        self.assertEqual([poll._state.db for poll in result['all']], ['default', 'other', 'default'])
+
+    def test_from_db(self):
+        polls = list(Poll.objects.order_by('pk'))
+        initialized = self.count_post_init()
+        self.cache.set('a', polls)
+        self.assertPollsEqual(self.cache.get('a'), polls)
+        self.assertEqual(len(initialized), 3)
+
+    def test_bypass_init(self):
+        polls = list(Poll.objects.order_by('pk'))
+        serializer = ModelSerializer(bypass_init=True)
+        initialized = self.count_post_init()
+        self.assertPollsEqual(serializer.deserialize(serializer.serialize(polls)), polls)
+        self.assertEqual(initialized, [])